@@ -7,14 +7,27 @@ Region: North America
 
 import os
 import time
+import asyncio
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, fall back to CSV output
+    pa = None
 from datetime import datetime, timedelta
 import logging
 import sys
 import json
+import csv
 import threading
+from bisect import bisect_left
+from multiprocessing.pool import ThreadPool
+
+from runtime_utils import next_deadline, njit, run_in_daemon
 
 # ---------------------------
 # Setup logging
@@ -61,6 +74,7 @@ CONFIG = {
         "country": "USA"
     },
     "update_interval_minutes": 5,  # Reduced for testing
+    "data_dir": "./sky_shield_data",
     "data_sources": {
         "iqair": "https://api.airvisual.com/v2/",
         "open_aq": "https://api.openaq.org/v2/",
@@ -108,32 +122,104 @@ HEALTH_THRESHOLDS = {
     }
 }
 
+# Per-city display labels, built once instead of per record
+def _make_city_labels(city_info):
+    return {
+        "source": f"IQAir - {city_info['city']}, {city_info['country']}",
+        "co2_source": f"CO2 Estimate - {city_info['city']}"
+    }
+
+_CITY_LABELS = {
+    (c["city"], c["country"]): _make_city_labels(c) for c in CONFIG["north_america_cities"]
+}
+
+def get_city_labels(city_info):
+    """Cached labels for configured cities, built on the fly for any other"""
+    labels = _CITY_LABELS.get((city_info["city"], city_info["country"]))
+    return labels if labels is not None else _make_city_labels(city_info)
+
+# Rating table frozen at import: (GOOD, MODERATE, BAD) upper bounds and
+# the matching descriptions, indexed by bisect/searchsorted position
+_RATING_LABELS = ("GOOD", "MODERATE", "UNHEALTHY", "VERY UNHEALTHY")
+_RATING_INDICATORS = ("[G]", "[M]", "[U]", "[VU]")
+_RATING_TABLE = {
+    pollutant: (
+        (t["GOOD"], t["MODERATE"], t["BAD"]),
+        (t["GOOD_DESC"], t["MODERATE_DESC"], t["BAD_DESC"], "Dangerous pollution levels")
+    )
+    for pollutant, t in HEALTH_THRESHOLDS.items()
+}
+_UNKNOWN_RATING = ("UNKNOWN", "[?]", "No rating available")
+
 # Global variables for monitoring
 current_data = []
 monitoring_active = True
 run_count = 0
 
+# ---------------------------
+# HTTP WORKERS & RATE LIMITING
+# ---------------------------
+# City requests are I/O bound, so a small thread pool overlaps the round-trips.
+# ThreadPool workers are daemon threads: stopping never waits on a request
+_HTTP_POOL = ThreadPool(8)
+
+# Shared session so repeated calls reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                       max_retries=Retry(total=3, backoff_factor=0.3))
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+# IQAir quota: at most one request started per interval (replaces the old sleep)
+IQAIR_MIN_INTERVAL = 1.0
+_iqair_lock = threading.Lock()
+_iqair_next_slot = 0.0
+
+def wait_for_iqair_slot():
+    """Block until the next IQAir request slot is available"""
+    global _iqair_next_slot
+    with _iqair_lock:
+        now = time.monotonic()
+        wait = max(0.0, _iqair_next_slot - now)
+        _iqair_next_slot = max(now, _iqair_next_slot) + IQAIR_MIN_INTERVAL
+    if wait:
+        time.sleep(wait)
+
 # ---------------------------
 # CORE DATA FUNCTIONS
 # ---------------------------
 def get_health_rating(pollutant_type, value):
     """Get health rating for a pollutant value"""
-    if pollutant_type not in HEALTH_THRESHOLDS:
-        return "UNKNOWN", "[?]", "No rating available"
+    if pollutant_type not in _RATING_TABLE:
+        return _UNKNOWN_RATING
 
-    thresholds = HEALTH_THRESHOLDS[pollutant_type]
-
-    if value <= thresholds["GOOD"]:
-        return "GOOD", "[G]", thresholds["GOOD_DESC"]
-    elif value <= thresholds["MODERATE"]:
-        return "MODERATE", "[M]", thresholds["MODERATE_DESC"]
-    elif value <= thresholds["BAD"]:
-        return "UNHEALTHY", "[U]", thresholds["BAD_DESC"]
+    thresholds, descriptions = _RATING_TABLE[pollutant_type]
+    if np.isnan(value):
+        # Failed every <= test in the original chain: worst band
+        idx = len(thresholds)
     else:
-        return "VERY UNHEALTHY", "[VU]", "Dangerous pollution levels"
+        idx = bisect_left(thresholds, value)  # value <= threshold stays in that band
+    return _RATING_LABELS[idx], _RATING_INDICATORS[idx], descriptions[idx]
+
+def get_health_ratings(pollutant_types, values):
+    """Vectorized get_health_rating over parallel lists of pollutants and values"""
+    no_limits = (np.inf, np.inf, np.inf)
+    thresholds = np.array(
+        [_RATING_TABLE.get(p, (no_limits,))[0] for p in pollutant_types], dtype=float
+    ).reshape(-1, 3)
+    # Per-row equivalent of np.searchsorted(..., side="left"); NaN rates worst
+    values = np.asarray(values, dtype=float)
+    indices = np.where(np.isnan(values), thresholds.shape[1],
+                       (values[:, None] > thresholds).sum(axis=1))
+
+    return [
+        (_RATING_LABELS[i], _RATING_INDICATORS[i], _RATING_TABLE[p][1][i])
+        if p in _RATING_TABLE else _UNKNOWN_RATING
+        for p, i in zip(pollutant_types, indices)
+    ]
 
-def get_iqair_city_data(city_info):
-    """Get air quality data for a specific city from IQAir"""
+def get_iqair_city_data(city_info, timestamp=None):
+    """Get air quality data and weather for a city from IQAir -> (results, weather)"""
     try:
         api_key = CONFIG["api_keys"]["iqair"]
         city = city_info["city"]
@@ -149,132 +235,127 @@ def get_iqair_city_data(city_info):
         }
 
         logger.info(f"Fetching data for {city}, {country}")
-        response = requests.get(url, params=params, timeout=15)
+        wait_for_iqair_slot()
+        response = _SESSION.get(url, params=params, timeout=15)
 
         if response.status_code == 200:
             data = response.json()
-            return process_iqair_response(data, city_info)
+            return process_iqair_response(data, city_info, timestamp)
         else:
             logger.warning(f"API returned status {response.status_code} for {city}")
-            return []
+            return [], {}
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Network error for {city_info['city']}: {e}")
-        return []
+        return [], {}
     except Exception as e:
         logger.error(f"Unexpected error for {city_info['city']}: {e}")
-        return []
+        return [], {}
 
-def process_iqair_response(data, city_info):
-    """Process IQAir API response"""
+def process_iqair_response(data, city_info, timestamp=None):
+    """Process IQAir API response -> (results, weather)"""
     results = []
+    weather = {}
+    if timestamp is None:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     try:
         if 'data' in data and 'current' in data['data']:
             current = data['data']['current']
             pollution = current.get('pollution', {})
-            weather = current.get('weather', {})
-
-            city_name = f"{city_info['city']}, {city_info['country']}"
-
-            # Process AQI and PM2.5
-            aqius = pollution.get('aqius', 0)
-            if aqius > 0:
-                pm25 = aqi_to_pm25(aqius)
-                rating, indicator, description = get_health_rating("PM2_5", pm25)
-
-                results.append({
-                    'pollutant': 'PM2_5',
-                    'value': pm25,
-                    'units': 'μg/m³',
-                    'source': f'IQAir - {city_name}',
-                    'rating': rating,
-                    'indicator': indicator,
-                    'description': description,
-                    'aqi': aqius,
+            iqair_weather = current.get('weather', {})
+            if iqair_weather:
+                # IQAir ships current weather with the pollution data
+                weather = {
                     'city': city_info['city'],
                     'country': city_info['country'],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-
-            # Process other pollutants if available
+                    'temperature': iqair_weather.get('tp'),
+                    'humidity': iqair_weather.get('hu'),
+                    'pressure': iqair_weather.get('pr'),
+                    'wind_speed': iqair_weather.get('ws'),
+                    'wind_direction': iqair_weather.get('wd'),
+                    'source': 'IQAir',
+                    'timestamp': timestamp
+                }
+
+            source = get_city_labels(city_info)["source"]
+
+            # Gather readings first, then rate them all in one call
+            readings = []
+            aqius = pollution.get('aqius', 0)
+            if aqius > 0:
+                readings.append(('PM2_5', aqi_to_pm25(aqius), 'μg/m³'))
             if pollution.get('o3'):
-                o3_value = pollution['o3']
-                rating, indicator, description = get_health_rating("O3", o3_value)
-                results.append({
-                    'pollutant': 'O3',
-                    'value': o3_value,
-                    'units': 'ppb',
-                    'source': f'IQAir - {city_name}',
-                    'rating': rating,
-                    'indicator': indicator,
-                    'description': description,
-                    'city': city_info['city'],
-                    'country': city_info['country'],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-
+                readings.append(('O3', pollution['o3'], 'ppb'))
             if pollution.get('no2'):
-                no2_value = pollution['no2']
-                rating, indicator, description = get_health_rating("NO2", no2_value)
-                results.append({
-                    'pollutant': 'NO2',
-                    'value': no2_value,
-                    'units': 'ppb',
-                    'source': f'IQAir - {city_name}',
+                readings.append(('NO2', pollution['no2'], 'ppb'))
+
+            ratings = get_health_ratings([r[0] for r in readings], [r[1] for r in readings])
+
+            for (pollutant, value, units), (rating, indicator, description) in zip(readings, ratings):
+                record = {
+                    'pollutant': pollutant,
+                    'value': value,
+                    'units': units,
+                    'source': source,
                     'rating': rating,
                     'indicator': indicator,
-                    'description': description,
-                    'city': city_info['city'],
-                    'country': city_info['country'],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+                    'description': description
+                }
+                if pollutant == 'PM2_5':
+                    record['aqi'] = aqius
+                record['city'] = city_info['city']
+                record['country'] = city_info['country']
+                record['timestamp'] = timestamp
+                results.append(record)
 
     except Exception as e:
         logger.error(f"Error processing IQAir data: {e}")
 
-    return results
+    return results, weather
 
-def get_co2_estimation(city_info):
+# CO2 estimation tables: per-city base level, rush hours and rating bands
+_CO2_DEFAULT_BASE = 420 + 20
+_CO2_BASE = {
+    city: 420 + adjustment for city, adjustment in {
+        "New York": 25, "Los Angeles": 30, "Chicago": 20,
+        "Toronto": 15, "Mexico City": 35
+    }.items()
+}
+_CO2_RUSH_HOUR_BONUS = 15
+_RUSH_HOURS = frozenset(range(7, 10)) | frozenset(range(16, 19))
+_CO2_BANDS = (450, 600, 1000)
+_CO2_RATINGS = (
+    ("EXCELLENT", "[E]", "Fresh outdoor air"),
+    ("GOOD", "[G]", "Typical urban air"),
+    ("MODERATE", "[M]", "Elevated CO2 levels"),
+    ("POOR", "[P]", "High CO2 concentration")
+)
+
+def get_co2_estimation(city_info, timestamp=None, hour=None):
     """Get estimated CO2 levels for a city"""
+    if timestamp is None:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if hour is None:
+        hour = datetime.now().hour
     try:
-        # Base CO2 level with city adjustments
-        base_co2 = 420
-        city_adjustments = {
-            "New York": 25, "Los Angeles": 30, "Chicago": 20,
-            "Toronto": 15, "Mexico City": 35
-        }
-
-        adjustment = city_adjustments.get(city_info["city"], 20)
-        current_hour = datetime.now().hour
+        estimated_co2 = _CO2_BASE.get(city_info["city"], _CO2_DEFAULT_BASE)
+        if hour in _RUSH_HOURS:
+            estimated_co2 += _CO2_RUSH_HOUR_BONUS
 
-        # Rush hour adjustment
-        if 7 <= current_hour <= 9 or 16 <= current_hour <= 18:
-            adjustment += 15
-
-        estimated_co2 = base_co2 + adjustment
-
-        # Get CO2 rating
-        if estimated_co2 <= 450:
-            rating, indicator, desc = "EXCELLENT", "[E]", "Fresh outdoor air"
-        elif estimated_co2 <= 600:
-            rating, indicator, desc = "GOOD", "[G]", "Typical urban air"
-        elif estimated_co2 <= 1000:
-            rating, indicator, desc = "MODERATE", "[M]", "Elevated CO2 levels"
-        else:
-            rating, indicator, desc = "POOR", "[P]", "High CO2 concentration"
+        rating, indicator, desc = _CO2_RATINGS[bisect_left(_CO2_BANDS, estimated_co2)]
 
         return {
             'pollutant': 'CO2',
             'value': estimated_co2,
             'units': 'ppm',
-            'source': f'CO2 Estimate - {city_info["city"]}',
+            'source': get_city_labels(city_info)["co2_source"],
             'rating': rating,
             'indicator': indicator,
             'description': desc,
             'city': city_info['city'],
             'country': city_info['country'],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': timestamp,
             'note': 'Estimated based on location and time'
         }
 
@@ -282,16 +363,24 @@ def get_co2_estimation(city_info):
         logger.error(f"CO2 estimation error: {e}")
         return None
 
-def aqi_to_pm25(aqi):
-    """Convert AQI to PM2.5 concentration"""
+@njit(cache=True)
+def _aqi_to_pm25_scalar(aqi):
+    """Compiled scalar AQI -> PM2.5 breakpoint conversion"""
     if aqi <= 50:
-        return (aqi * 12.0 / 50)
+        return aqi * 12.0 / 50
     elif aqi <= 100:
-        return (12.1 + (aqi - 51) * (35.4 - 12.1) / 49)
+        return 12.1 + (aqi - 51) * (35.4 - 12.1) / 49
     elif aqi <= 150:
-        return (35.5 + (aqi - 101) * (55.4 - 35.5) / 49)
+        return 35.5 + (aqi - 101) * (55.4 - 35.5) / 49
     else:
-        return (55.5 + (aqi - 151) * (150.4 - 55.5) / 49)
+        return 55.5 + (aqi - 151) * (150.4 - 55.5) / 49
+
+# First call compiles; get it done before the first monitoring cycle
+_aqi_to_pm25_scalar(42.0)
+
+def aqi_to_pm25(aqi):
+    """Convert AQI to PM2.5 concentration"""
+    return float(_aqi_to_pm25_scalar(float(aqi)))
 
 # ---------------------------
 # DATA COLLECTION
@@ -300,28 +389,38 @@ def collect_air_quality_data():
     """Collect air quality data from all sources"""
     logger.info("Starting data collection...")
     all_data = []
+    # One timestamp shared by every record of this cycle
+    now = datetime.now()
+    timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
 
-    # Get data for each city
-    for city in CONFIG["north_america_cities"]:
+    def fetch(city):
+        try:
+            return city, get_iqair_city_data(city, timestamp)
+        except Exception as e:
+            return city, e
+
+    # Fetch all cities in parallel, handling each as soon as it completes
+    for city, result in _HTTP_POOL.imap_unordered(fetch, CONFIG["north_america_cities"]):
+        if not monitoring_active:
+            logger.info("Monitoring stopped, abandoning data collection")
+            return all_data
         try:
-            # Get IQAir data
-            iqair_data = get_iqair_city_data(city)
+            if isinstance(result, Exception):
+                raise result
+            iqair_data, _ = result
             if iqair_data:
                 all_data.extend(iqair_data)
                 logger.info(f"Successfully collected IQAir data for {city['city']}")
             else:
                 logger.warning(f"No IQAir data for {city['city']}")
-
-            # Add CO2 estimation
-            co2_data = get_co2_estimation(city)
-            if co2_data:
-                all_data.append(co2_data)
-
-            time.sleep(1)  # Rate limiting
-
         except Exception as e:
             logger.error(f"Error processing city {city['city']}: {e}")
-            continue
+
+    # Add CO2 estimations (no network involved)
+    for city in CONFIG["north_america_cities"]:
+        co2_data = get_co2_estimation(city, timestamp, now.hour)
+        if co2_data:
+            all_data.append(co2_data)
 
     logger.info(f"Collection complete. Total measurements: {len(all_data)}")
     return all_data
@@ -386,6 +485,14 @@ def display_results(air_quality_data, run_number):
 # ---------------------------
 # MONITORING SYSTEM
 # ---------------------------
+def save_csv(filename, rows):
+    """Write a list of dicts to CSV; columns are the union of all keys"""
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
 def perform_update():
     """Perform a single update cycle"""
     global run_count
@@ -398,11 +505,28 @@ def perform_update():
 
         # Save data
         if data:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"sky_shield_data_{timestamp}.csv"
-            df = pd.DataFrame(data)
-            df.to_csv(filename, index=False)
-            print(f"💾 Data saved to: {filename}")
+            now = datetime.now()
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
+            saved = []
+            if pa is not None:
+                # Columnar zstd Parquet, one date=YYYY-MM-DD partition per day
+                day_dir = os.path.join(CONFIG["data_dir"], f"date={now.strftime('%Y-%m-%d')}")
+                os.makedirs(day_dir, exist_ok=True)
+                filename = os.path.join(day_dir, f"sky_shield_data_{timestamp}.parquet")
+                # Columns from the union of keys: from_pylist would take the schema
+                # from the first row and drop 'aqi'/'note' depending on city order
+                columns = dict.fromkeys(key for row in data for key in row)
+                table = pa.table({key: [row.get(key) for row in data] for key in columns})
+                pq.write_table(table, filename, compression="zstd")
+                saved.append(filename)
+
+            # CSV only without pyarrow or when explicitly requested
+            if pa is None or os.environ.get("EMIT_CSV"):
+                filename = f"sky_shield_data_{timestamp}.csv"
+                save_csv(filename, data)
+                saved.append(filename)
+
+            print(f"💾 Data saved to: {' and '.join(saved)}")
 
     except Exception as e:
         logger.error(f"Update error: {e}")
@@ -425,28 +549,23 @@ def start_monitoring():
     print("\nPress Ctrl+C to stop monitoring")
     print("=" * 80)
 
-    # Initial update
-    perform_update()
-
-    # Start auto-updates
-    def auto_update():
-        while monitoring_active:
-            time.sleep(CONFIG['update_interval_minutes'] * 60)
-            if monitoring_active:
-                perform_update()
-
-    update_thread = threading.Thread(target=auto_update, daemon=True)
-    update_thread.start()
-
-    # Keep main thread alive
     try:
-        while monitoring_active:
-            time.sleep(1)
+        asyncio.run(run_periodic_updates())
     except KeyboardInterrupt:
         monitoring_active = False
         print("\n\n🛑 Monitoring stopped by user")
         print("Thank you for using SkyShield!")
 
+async def run_periodic_updates():
+    """Run perform_update now and then every update interval, without drift"""
+    interval = CONFIG['update_interval_minutes'] * 60
+    next_run = time.monotonic()
+    while monitoring_active:
+        await asyncio.sleep(max(0.0, next_run - time.monotonic()))
+        # perform_update blocks on network I/O, run it on a daemon thread
+        await run_in_daemon(perform_update)
+        next_run = next_deadline(next_run, interval)
+
 # ---------------------------
 # MAIN EXECUTION
 # ---------------------------
@@ -460,7 +579,7 @@ def main():
     # Test basic connectivity
     print("🔍 Testing system...")
     try:
-        response = requests.get("http://api.airvisual.com/v2/nearest_city?key=demo", timeout=10)
+        response = _SESSION.get("http://api.airvisual.com/v2/nearest_city?key=demo", timeout=10)
         if response.status_code == 200:
             print("✅ Internet connection: OK")
         else:
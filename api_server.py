@@ -1,13 +1,23 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+import numpy as np
+import orjson
 import uvicorn
 import os
+import time
 
+from runtime_utils import next_deadline, njit
 # Import from your SkyShield script
-from skyshield import collect_all_data, get_weather_data, CONFIG
+from skyshield import collect_all_data, get_cached_weather, MeasurementBatch, CONFIG
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# orjson serializes the (fairly large) location payloads much faster
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Configure CORS from environment (comma-separated list) or default to allow localhost and Vercel origin
 allow_list = [
@@ -25,54 +35,142 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------------------------
+# Background data refresh
+# -------------------------
+# A single background task polls upstream once per update interval and
+# swaps in a new snapshot; routes only ever read the latest snapshot.
+REFRESH_INTERVAL_SECONDS = CONFIG["update_interval_minutes"] * 60
+CACHE_CONTROL = f"public, max-age={REFRESH_INTERVAL_SECONDS}"
+# How long a request waits for the first snapshot before giving up with 503
+SNAPSHOT_WAIT_SECONDS = 30
+# Until the first snapshot lands, retry after 5s, 10s, ... capped at 60s
+FIRST_SNAPSHOT_RETRY_SECONDS = 5
+FIRST_SNAPSHOT_RETRY_MAX_SECONDS = 60
+
+_snapshot = (MeasurementBatch([]), {})  # (aq_batch, weather_data), replaced as a whole
+_snapshot_ready = asyncio.Event()
+_refresh_task = None
+
+def _collect_snapshot():
+    """Run a full (blocking) collection and return (aq_batch, weather_data)"""
+    aq_batch = MeasurementBatch(collect_all_data())
+    return aq_batch, get_cached_weather()
+
+async def _refresher():
+    """Refresh the snapshot every update interval on a monotonic schedule"""
+    global _snapshot
+    next_run = time.monotonic()
+    retry_delay = FIRST_SNAPSHOT_RETRY_SECONDS
+    while True:
+        await asyncio.sleep(max(0.0, next_run - time.monotonic()))
+        try:
+            # collect_all_data uses blocking requests, keep it off the event loop
+            snapshot = await asyncio.to_thread(_collect_snapshot)
+            if len(snapshot[0]) or _snapshot_ready.is_set():
+                _snapshot = snapshot
+                _snapshot_ready.set()
+            else:
+                logger.warning("First snapshot came back empty")
+        except Exception as e:
+            logger.error(f"Snapshot refresh failed: {e}")
+        if not _snapshot_ready.is_set():
+            # Nothing to serve yet: retry soon rather than a full interval later
+            next_run = time.monotonic() + retry_delay
+            retry_delay = min(retry_delay * 2, FIRST_SNAPSHOT_RETRY_MAX_SECONDS)
+            continue
+        next_run = next_deadline(next_run, REFRESH_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def start_refresher():
+    global _refresh_task
+    _refresh_task = asyncio.create_task(_refresher())
+
+@app.on_event("shutdown")
+async def stop_refresher():
+    if _refresh_task:
+        _refresh_task.cancel()
+
+async def get_snapshot():
+    """Latest (aq_batch, weather_data); waits (bounded) only for the very first refresh"""
+    try:
+        await asyncio.wait_for(_snapshot_ready.wait(), SNAPSHOT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        # First refresh failed or is still running; the next try is up to an interval away
+        raise HTTPException(status_code=503, detail="Air quality data not available yet",
+                            headers={"Retry-After": str(SNAPSHOT_WAIT_SECONDS)})
+    return _snapshot
+
 # -------------------------
 # Format function to unify JSON
 # -------------------------
-def format_locations(aq_data, weather_data):
+@njit(cache=True)
+def _pm25_to_aqi_scalar(pm25):
+    """Compiled scalar PM2.5 -> AQI breakpoint conversion"""
+    if pm25 <= 12:
+        return int((pm25 / 12) * 50)
+    elif pm25 <= 35.4:
+        return int(50 + (pm25 - 12.1) * (100 - 51) / (35.4 - 12.1))
+    elif pm25 <= 55.4:
+        return int(101 + (pm25 - 35.5) * (150 - 101) / (55.4 - 35.5))
+    else:
+        return int(151 + (pm25 - 55.5) * (200 - 151) / (150.4 - 55.5))
+
+# Compile while the server starts rather than inside the first /airquality call
+_pm25_to_aqi_scalar(20.0)
+
+def _pm25_to_aqi(pm25):
+    """EPA breakpoint conversion (simplified) of one PM2.5 value"""
+    return int(_pm25_to_aqi_scalar(float(pm25)))
+
+def iter_locations(aq_batch, weather_data):
+    """Yield one unified location dict per city that has any data"""
     cities = CONFIG["north_america_cities"]
-    locations = []
 
-    # ✅ Cairo timezone
+    # ✅ Cairo timezone, one timestamp for the whole response
     cairo_tz = timezone(timedelta(hours=3))
+    timestamp = datetime.now(cairo_tz).strftime("%Y-%m-%d %H:%M:%S")
 
     for city in cities:
         city_name = city["city"]
         country = city["country"]
 
-        # Get AQ and weather for this city
-        city_aq = [d for d in aq_data if d["city"] == city_name and d["country"] == country]
+        # Get AQ rows (by mask over the batch columns) and weather for this city
+        city_idx = np.flatnonzero(aq_batch.city_mask(city_name, country))
         city_weather = weather_data.get(f"{city_name}_{country}")
 
-        if not city_aq and not city_weather:
+        if not city_idx.size and not city_weather:
             continue
 
         # --- FIX: Compute AQI ---
         # Prefer provided AQI if exists, else derive from PM2.5, O3, NO2
         aqi_value = None
-        for aq in city_aq:
-            if "aqi" in aq and aq["aqi"]:
-                aqi_value = aq["aqi"]
-                break
+        city_aqis = aq_batch.aqi[city_idx]
+        provided = city_aqis[city_aqis != 0]
+        if provided.size:
+            aqi_value = int(provided[0])
 
         if not aqi_value:
+            city_pollutants = aq_batch.pollutant[city_idx]
+
+            def first_value(pollutant):
+                hits = city_idx[city_pollutants == pollutant]
+                return float(aq_batch.value[hits[0]]) if hits.size else None
+
             # Try deriving from PM2.5
-            pm25 = next((aq["value"] for aq in city_aq if aq["pollutant"] == "PM2_5"), None)
+            pm25 = first_value("PM2_5")
             if pm25:
-                # EPA breakpoint conversion (simplified)
-                if pm25 <= 12: aqi_value = int((pm25 / 12) * 50)
-                elif pm25 <= 35.4: aqi_value = int(50 + (pm25 - 12.1) * (100 - 51) / (35.4 - 12.1))
-                elif pm25 <= 55.4: aqi_value = int(101 + (pm25 - 35.5) * (150 - 101) / (55.4 - 35.5))
-                else: aqi_value = int(151 + (pm25 - 55.5) * (200 - 151) / (150.4 - 55.5))
+                aqi_value = _pm25_to_aqi(pm25)
 
             # If still missing, fallback to NO2
             if not aqi_value:
-                no2 = next((aq["value"] for aq in city_aq if aq["pollutant"] == "NO2"), None)
+                no2 = first_value("NO2")
                 if no2: 
                     aqi_value = min(200, int(no2 / 200 * 150))
 
             # If still missing, fallback to O3
             if not aqi_value:
-                o3 = next((aq["value"] for aq in city_aq if aq["pollutant"] == "O3"), None)
+                o3 = first_value("O3")
                 if o3:
                     aqi_value = min(200, int(o3 / 100 * 150))
 
@@ -81,71 +179,84 @@ def format_locations(aq_data, weather_data):
             "lat": city["lat"],
             "lon": city["lon"],
             "aqi": aqi_value if aqi_value else None,
-            "condition": city_aq[0]["description"] if city_aq else "Unknown",
+            "condition": aq_batch.description[city_idx[0]] if city_idx.size else "Unknown",
             "pollutants": [
                 {
-                    "name": aq["pollutant"],
-                    "value": aq["value"],
-                    "unit": aq["units"],
-                    "rating": aq["rating"],
+                    "name": aq_batch.pollutant[i],
+                    "value": float(aq_batch.value[i]),
+                    "unit": aq_batch.units[i],
+                    "rating": aq_batch.rating[i],
                 }
-                for aq in city_aq
+                for i in city_idx
             ],
             "weather": city_weather if city_weather else {},
             # ✅ Apply Cairo time here
-            "timestamp": datetime.now(cairo_tz).strftime("%Y-%m-%d %H:%M:%S"),
+            "timestamp": timestamp,
         }
-        locations.append(location)
+        yield location
 
-    return locations
+def format_locations(aq_batch, weather_data):
+    return list(iter_locations(aq_batch, weather_data))
 
 
 
 # -------------------------
 # API Routes
 # -------------------------
+# Alert levels: an AQI at or above each break (and below the next) maps to
+# the level and message at the same position; anything under 100 is GOOD
+_ALERT_BREAKS = np.array([-np.inf, 100, 150, 200, 300])
+_ALERT_LEVELS = ("GOOD", "MODERATE", "UNHEALTHY", "VERY_UNHEALTHY", "HAZARDOUS")
+_ALERT_MESSAGES = (
+    "Good air quality",
+    "Limit prolonged exertion",
+    "Sensitive groups avoid outdoor",
+    "Stay indoors",
+    "Avoid all outdoor activity",
+)
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "SkyShield API running 🚀"}
 
 @app.get("/airquality")
-def get_air_quality():
-    aq_data = collect_all_data()
-    from skyshield import weather_data  # grab global weather_data
-    locations = format_locations(aq_data, weather_data)
-    return {"locations": locations}
+async def get_air_quality():
+    aq_batch, weather_data = await get_snapshot()
+    locations = format_locations(aq_batch, weather_data)
+    return ORJSONResponse({"locations": locations}, headers={"Cache-Control": CACHE_CONTROL})
 
 @app.get("/alerts")
-def get_alerts():
-    aq_data = collect_all_data()
-    from skyshield import weather_data
-    locations = format_locations(aq_data, weather_data)
-
-    alerts = []
-    for loc in locations:
-        aqi = loc.get("aqi") or 0
-        if aqi >= 300:
-            alerts.append({"city": loc["name"], "level": "HAZARDOUS", "message": "Avoid all outdoor activity"})
-        elif aqi >= 200:
-            alerts.append({"city": loc["name"], "level": "VERY_UNHEALTHY", "message": "Stay indoors"})
-        elif aqi >= 150:
-            alerts.append({"city": loc["name"], "level": "UNHEALTHY", "message": "Sensitive groups avoid outdoor"})
-        elif aqi >= 100:
-            alerts.append({"city": loc["name"], "level": "MODERATE", "message": "Limit prolonged exertion"})
-        else:
-            alerts.append({"city": loc["name"], "level": "GOOD", "message": "Good air quality"})
-
-    return {"alerts": alerts, "locations": locations}
+async def get_alerts():
+    aq_batch, weather_data = await get_snapshot()
+    locations = format_locations(aq_batch, weather_data)
+
+    # One searchsorted over all cities instead of an if/elif chain per city
+    # NaN compares false against every break, so like the old chain it rates GOOD
+    aqis = np.nan_to_num(np.array([loc.get("aqi") or 0 for loc in locations], dtype=float), nan=0.0)
+    level_idx = np.searchsorted(_ALERT_BREAKS, aqis, side="right") - 1
+    alerts = [
+        {"city": loc["name"], "level": _ALERT_LEVELS[i], "message": _ALERT_MESSAGES[i]}
+        for loc, i in zip(locations, level_idx)
+    ]
+
+    return ORJSONResponse({"alerts": alerts, "locations": locations}, headers={"Cache-Control": CACHE_CONTROL})
 
 @app.get("/history")
-def get_history():
+async def get_history():
     # For now return last collected data (SkyShield saves CSV)
     # Later you can load from saved CSV files if needed
-    aq_data = collect_all_data()
-    from skyshield import weather_data
-    locations = format_locations(aq_data, weather_data)
-    return {"history": locations}
+    aq_batch, weather_data = await get_snapshot()
+
+    # Stream {"history": [...]} one location at a time instead of building
+    # the whole payload in memory first
+    async def stream_history():
+        yield b'{"history":['
+        for n, location in enumerate(iter_locations(aq_batch, weather_data)):
+            yield (b"," if n else b"") + orjson.dumps(location, option=orjson.OPT_SERIALIZE_NUMPY)
+        yield b"]}"
+
+    return StreamingResponse(stream_history(), media_type="application/json",
+                             headers={"Cache-Control": CACHE_CONTROL})
 
 
 # -------------------------
@@ -153,5 +264,8 @@ def get_history():
 # -------------------------
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    # When deploying on Render, do not use reload and set workers appropriately
-    uvicorn.run("api_server:app", host="0.0.0.0", port=port, reload=False)
+    # Each worker runs its own snapshot refresher, so every extra worker
+    # multiplies upstream API quota use; more than one is opt-in via WEB_CONCURRENCY
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    # When deploying on Render, do not use reload
+    uvicorn.run("api_server:app", host="0.0.0.0", port=port, workers=workers, reload=False)
@@ -1,13 +1,16 @@
 import os
+import csv
+import json
 import time
-import earthaccess
+import importlib.util
 import xarray as xr
-import matplotlib.pyplot as plt
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import logging
-import requests
+import asyncio
+import aiohttp
 
 # ---------------------------
 # Setup logging
@@ -35,7 +38,18 @@ CONFIG = {
         "bbox": [40.4, -74.5, 41.0, -73.5]  # NYC area bounding box
     },
     "days_back": 2,
-    "download_dir": "./air_quality_data"
+    "download_dir": "./air_quality_data",
+    "max_parallel_datasets": 5,  # stay under Earthdata's concurrent connection limit
+    "granules_per_dataset": 3,   # spare granules in case the newest has a data gap
+    "search_count": 5,           # candidates fetched before metadata filtering
+    "max_cloud_cover": 60        # percent; cloudier granules rarely have valid pixels
+}
+
+# Default headers for the shared aiohttp session used by the REST calls
+HTTP_HEADERS = {
+    "User-Agent": "SkyShield/1.0",
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate"  # OpenAQ radius queries compress ~10x
 }
 
 # ---------------------------
@@ -80,6 +94,28 @@ HEALTH_THRESHOLDS = {
     }
 }
 
+# Thresholds frozen as sorted arrays for np.searchsorted, with the
+# (rating, emoji, description) for each of the four resulting bands
+_THR = {
+    p: np.array([t["GOOD"], t["MODERATE"], t["BAD"]], dtype=np.float64)
+    for p, t in HEALTH_THRESHOLDS.items()
+}
+_LABELS = {
+    p: (("GOOD", "🟢", t["GOOD_DESC"]),
+        ("MODERATE", "🟡", t["MODERATE_DESC"]),
+        ("BAD", "🟠", t["BAD_DESC"]),
+        ("VERY BAD", "🔴", "Dangerous pollution levels"))
+    for p, t in HEALTH_THRESHOLDS.items()
+}
+_UNKNOWN_LABEL = ("UNKNOWN", "⚪", "No rating available")
+
+_ADVICE = {
+    "GOOD": "No precautions needed",
+    "MODERATE": "Generally acceptable for most people",
+    "BAD": "Sensitive groups should reduce outdoor activity",
+    "VERY BAD": "Everyone should reduce outdoor exertion"
+}
+
 # ---------------------------
 # 4. DATASETS TO MONITOR
 # ---------------------------
@@ -140,6 +176,8 @@ DATASETS = [
 def authenticate():
     """Authenticate with NASA Earthdata"""
     try:
+        # Heavy import, only paid when the satellite path actually runs
+        import earthaccess
         auth = earthaccess.login(strategy="netrc")
         if auth and auth.authenticated:
             logger.info("✅ NASA Earthdata authentication successful")
@@ -157,30 +195,44 @@ def authenticate():
 # ---------------------------
 def get_health_rating(pollutant_type, value):
     """Get health rating for a pollutant value"""
-    if pollutant_type not in HEALTH_THRESHOLDS:
-        return "UNKNOWN", "⚪", "No rating available"
+    if pollutant_type not in _THR:
+        return _UNKNOWN_LABEL
+
+    return _LABELS[pollutant_type][int(np.searchsorted(_THR[pollutant_type], value))]
 
-    thresholds = HEALTH_THRESHOLDS[pollutant_type]
 
-    if value <= thresholds["GOOD"]:
-        return "GOOD", "🟢", thresholds["GOOD_DESC"]
-    elif value <= thresholds["MODERATE"]:
-        return "MODERATE", "🟡", thresholds["MODERATE_DESC"]
-    elif value <= thresholds["BAD"]:
-        return "BAD", "🟠", thresholds["BAD_DESC"]
+def get_health_ratings(pollutant_type, values):
+    """Vectorized get_health_rating -> (ratings, emojis, descriptions) arrays"""
+    values = np.asarray(values, dtype=np.float64)
+    if pollutant_type not in _THR:
+        labels = np.array([_UNKNOWN_LABEL], dtype=object)[np.zeros(values.shape, dtype=int)]
     else:
-        return "VERY BAD", "🔴", "Dangerous pollution levels"
+        # side="left": a value equal to a threshold stays in the lower band
+        labels = np.array(_LABELS[pollutant_type], dtype=object)[np.searchsorted(_THR[pollutant_type], values)]
+    return labels[..., 0], labels[..., 1], labels[..., 2]
+
 
+def rate_records(records):
+    """Attach rating/emoji/description/advice to records, one searchsorted per pollutant"""
+    by_pollutant = {}
+    for record in records:
+        by_pollutant.setdefault(record['pollutant'], []).append(record)
 
+    for pollutant, bucket in by_pollutant.items():
+        values = np.fromiter((r['value'] for r in bucket), dtype=np.float64, count=len(bucket))
+        ratings, emojis, descriptions = get_health_ratings(pollutant, values)
+        for record, rating, emoji, description in zip(bucket, ratings, emojis, descriptions):
+            record['rating'] = rating
+            record['emoji'] = emoji
+            record['description'] = description
+            record['advice'] = get_health_advice(pollutant, rating)
+    return records
+
+
+@lru_cache(maxsize=16)
 def get_health_advice(pollutant_type, rating):
     """Get health advice based on rating"""
-    advice = {
-        "GOOD": "No precautions needed",
-        "MODERATE": "Generally acceptable for most people",
-        "BAD": "Sensitive groups should reduce outdoor activity",
-        "VERY BAD": "Everyone should reduce outdoor exertion"
-    }
-    return advice.get(rating, "Check local air quality advisories")
+    return _ADVICE.get(rating, "Check local air quality advisories")
 
 
 # ---------------------------
@@ -193,120 +245,220 @@ def fetch_nasa_data():
     end = datetime.utcnow()
     start = end - timedelta(days=CONFIG['days_back'])
 
-    results = []
+    # Datasets are independent network-bound jobs, fetch them in parallel
+    with ThreadPoolExecutor(max_workers=CONFIG['max_parallel_datasets']) as executor:
+        fetched = executor.map(lambda dataset: _fetch_one(dataset, start, end), DATASETS)
+        results = [result for result in fetched if result]
+
+    # Classify all satellite values together once every dataset is in
+    return rate_records(results)
+
 
-    for dataset in DATASETS:
-        logger.info(f"🔍 Searching: {dataset['name']}")
+def _fetch_one(dataset, start, end):
+    """Search, download and process the latest granules of one dataset"""
+    logger.info(f"🔍 Searching: {dataset['name']}")
+
+    try:
+        import earthaccess
+
+        # Search for data with API key in headers; CMR drops granules
+        # whose footprint misses the bounding box
+        south, west, north, east = CONFIG["location"]["bbox"]
+        granules = select_granules(earthaccess.search_data(
+            short_name=dataset["short_name"],
+            temporal=(start, end),
+            bounding_box=(west, south, east, north),
+            count=CONFIG['search_count']
+        ))
+
+        if not granules:
+            logger.info(f"   No data for {dataset['name']}")
+            return None
+
+        # Download and process
+        result = process_granules(granules, dataset)
+        if result:
+            logger.info(f"   ✅ SUCCESS: {result['pollutant']} = {result['value']:.3f}")
+        return result
+
+    except Exception as e:
+        logger.error(f"   ❌ Error with {dataset['name']}: {e}")
+        return None
 
+
+def _granule_start(granule):
+    """Start time of a granule from its UMM metadata (ISO string, sorts lexically)"""
+    temporal = granule['umm'].get('TemporalExtent', {})
+    return temporal.get('RangeDateTime', {}).get('BeginningDateTime') or \
+        temporal.get('SingleDateTime', '')
+
+
+def select_granules(granules):
+    """Newest granules first, skipping those too cloudy to have valid pixels"""
+    usable = [
+        granule for granule in granules
+        if granule['umm'].get('CloudCover') is None or
+        granule['umm']['CloudCover'] < CONFIG['max_cloud_cover']
+    ]
+    usable.sort(key=_granule_start, reverse=True)
+    return usable[:CONFIG['granules_per_dataset']]
+
+
+def process_granules(granules, dataset_config):
+    """Stream a batch of granules and return the first one with a valid mean"""
+    unreadable = granules
+    # Datasets that only netcdf4 could open before skip straight to download
+    if _ENGINE_CACHE.get(dataset_config["short_name"]) != 'netcdf4':
+        result, unreadable = _process_streamed(granules, dataset_config)
+        if result or not unreadable:
+            return result
+
+    # h5netcdf could not parse these (e.g. HDF4 MOD04_L2): fetch to disk for netcdf4
+    return _process_downloaded(unreadable, dataset_config)
+
+
+def _process_streamed(granules, dataset_config):
+    """(first valid result, granules no streaming engine could open)"""
+    unreadable = []
+    try:
+        import earthaccess
+    except Exception as e:
+        logger.error(f"      ❌ Processing failed: {e}")
+        return None, list(granules)
+
+    for n, granule in enumerate(granules):
+        remote_files = []
         try:
-            # Search for data with API key in headers
-            granules = earthaccess.search_data(
-                short_name=dataset["short_name"],
-                temporal=(start, end),
-                count=1
-            )
-
-            if not granules:
-                logger.info(f"   No data for {dataset['name']}")
+            # File-like objects backed by HTTP range reads: only the bytes behind
+            # the chunks we touch are fetched, nothing is written to disk.
+            # One granule at a time, since a granule may have several data links
+            remote_files = earthaccess.open([granule])
+            if not remote_files:
+                unreadable.append(granule)
                 continue
 
-            # Download and process
-            result = process_granule(granules[0], dataset)
-            if result:
-                results.append(result)
-                logger.info(f"   ✅ SUCCESS: {result['pollutant']} = {result['value']:.3f}")
+            opened = False
+            for remote_file in remote_files:
+                logger.info(f"      📥 Streaming: {os.path.basename(getattr(remote_file, 'path', str(remote_file)))}")
+
+                # Stop at the first granule without a data gap over the region
+                result = extract_pollutant_data(remote_file, dataset_config, STREAM_ENGINES)
+                if result is UNREADABLE:
+                    continue
+                opened = True
+                if result:
+                    return result, []
+            if not opened:
+                unreadable.append(granule)
 
         except Exception as e:
-            logger.error(f"   ❌ Error with {dataset['name']}: {e}")
-            continue
+            logger.error(f"      ❌ Streaming failed: {e}")
+            # Opening the stream failed: let the download path try this and the rest
+            return None, unreadable + list(granules[n:])
 
-    return results
+        finally:
+            for remote_file in remote_files:
+                try:
+                    remote_file.close()
+                except Exception:
+                    pass
 
+    return None, unreadable
 
-def process_granule(granule, dataset_config):
-    """Process a single granule"""
-    try:
-        cleanup_dir()
-        local_files = earthaccess.download([granule], CONFIG['download_dir'])
 
-        if not local_files:
-            return None
-
-        file_path = local_files[0]
-        logger.info(f"      📥 Downloaded: {os.path.basename(file_path)}")
+def _process_downloaded(granules, dataset_config):
+    """Download granules and open them by local path with any engine"""
+    local_files = []
+    try:
+        import earthaccess
 
-        # Process file
-        result = extract_pollutant_data(file_path, dataset_config)
+        local_files = earthaccess.download(granules, local_path=CONFIG['download_dir'])
 
-        # Cleanup
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        for local_file in local_files:
+            logger.info(f"      📥 Downloaded: {os.path.basename(str(local_file))}")
+            result = extract_pollutant_data(str(local_file), dataset_config)
+            if result and result is not UNREADABLE:
+                return result
 
-        return result
+        return None
 
     except Exception as e:
         logger.error(f"      ❌ Processing failed: {e}")
         return None
 
+    finally:
+        for local_file in local_files:
+            try:
+                os.remove(local_file)
+            except OSError:
+                pass
 
-def extract_pollutant_data(file_path, dataset_config):
-    """Extract pollutant data from file"""
-    engines = ['netcdf4', 'h5netcdf']
 
+# With dask available, open granules lazily so only the chunks overlapping
+# the bounding box are read and decompressed
+OPEN_CHUNKS = {} if importlib.util.find_spec("dask") else None
+
+# h5netcdf first: it reads file-like objects, netcdf4 needs a local path
+ENGINES = ('h5netcdf', 'netcdf4')
+STREAM_ENGINES = ('h5netcdf',)
+# Returned by extract_pollutant_data when no engine could open the source
+UNREADABLE = object()
+# Variable-name fragments accepted by the fallback scan
+_KEYWORDS = frozenset(['no2', 'co2', 'o3', 'so2', 'aod'])
+
+
+def extract_pollutant_data(source, dataset_config, engines=ENGINES):
+    """Extract pollutant data from file (UNREADABLE if no engine opens it)"""
+    short_name = dataset_config["short_name"]
+    # Try the engine that last opened this dataset first, skipping a known failure
+    preferred = _ENGINE_CACHE.get(short_name)
+    if preferred in engines:
+        engines = (preferred,) + tuple(e for e in engines if e != preferred)
+
+    opened = False
     for engine in engines:
         try:
-            with xr.open_dataset(file_path, engine=engine) as ds:
+            with xr.open_dataset(source, engine=engine, chunks=OPEN_CHUNKS,
+                                 mask_and_scale=True, decode_cf=True,
+                                 decode_times=False) as ds:
+                opened = True
+                _ENGINE_CACHE[short_name] = engine
+
                 # Try each target variable
                 for target_var in dataset_config["variables"]:
                     if target_var in ds.variables:
                         data = ds[target_var]
 
                         # Calculate regional mean
-                        mean_val = calculate_regional_mean(data, ds)
+                        mean_val = calculate_regional_mean(data, ds, dataset_config["short_name"])
 
                         if not np.isnan(mean_val):
-                            # Get health rating
-                            rating, emoji, description = get_health_rating(dataset_config["type"], mean_val)
-                            advice = get_health_advice(dataset_config["type"], rating)
-
+                            # Health rating is attached later by rate_records
                             return {
                                 'pollutant': dataset_config["type"],
                                 'value': mean_val,
                                 'units': HEALTH_THRESHOLDS[dataset_config["type"]]["UNITS"],
                                 'source': dataset_config["name"],
                                 'variable': target_var,
-                                'rating': rating,
-                                'emoji': emoji,
-                                'description': description,
-                                'advice': advice,
                                 'timestamp': datetime.utcnow()
                             }
 
                 # Fallback: any variable with pollutant name
+                poll_key = dataset_config["type"].lower()
                 for var_name in ds.variables:
                     var_lower = var_name.lower()
-                    if (dataset_config["type"].lower() in var_lower or
-                            any(keyword in var_lower for keyword in ['no2', 'co2', 'o3', 'so2', 'aod'])):
+                    if poll_key in var_lower or any(keyword in var_lower for keyword in _KEYWORDS):
 
                         data = ds[var_name]
-                        mean_val = calculate_regional_mean(data, ds)
+                        mean_val = calculate_regional_mean(data, ds, dataset_config["short_name"])
 
                         if not np.isnan(mean_val):
-                            rating, emoji, description = get_health_rating(dataset_config["type"], mean_val)
-                            advice = get_health_advice(dataset_config["type"], rating)
-
                             return {
                                 'pollutant': dataset_config["type"],
                                 'value': mean_val,
                                 'units': getattr(data, 'units', 'unknown'),
                                 'source': dataset_config["name"],
                                 'variable': var_name,
-                                'rating': rating,
-                                'emoji': emoji,
-                                'description': description,
-                                'advice': advice,
                                 'timestamp': datetime.utcnow()
                             }
 
@@ -314,36 +466,129 @@ def extract_pollutant_data(file_path, dataset_config):
             logger.info(f"      Engine {engine} failed: {e}")
             continue
 
-    return None
+    return None if opened else UNREADABLE
+
 
+# Coordinate schemas persist between runs so warm runs skip the coord scan
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".skyshield", "cache.json")
+
+
+def _load_cache():
+    """Read the on-disk cache, empty if missing or unreadable"""
+    try:
+        with open(CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-def calculate_regional_mean(data, ds):
+
+def _save_cache(cache):
+    """Write the on-disk cache, a failure only costs the next warm start"""
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    except OSError as e:
+        logger.info(f"Could not write cache {CACHE_FILE}: {e}")
+
+
+_DISK_CACHE = _load_cache()
+# short_name -> (lat_coord, lon_coord, lat_ascending, lon_ascending)
+_COORD_CACHE = {name: tuple(schema)
+                for name, schema in _DISK_CACHE.get("coord_schema", {}).items()}
+# short_name -> xarray engine that opened its granules
+_ENGINE_CACHE = dict(_DISK_CACHE.get("engine", {}))
+
+
+def _coord_schema(ds, short_name=None):
+    """Latitude/longitude coordinate names and directions, cached per dataset"""
+    schema = _COORD_CACHE.get(short_name)
+    if schema and schema[0] in ds.coords and schema[1] in ds.coords:
+        return schema
+
+    lat_coord = next((c for c in ds.coords if 'lat' in c.lower()), None)
+    lon_coord = next((c for c in ds.coords if 'lon' in c.lower()), None)
+    if not (lat_coord and lon_coord):
+        return None
+
+    lat_vals = np.ravel(ds[lat_coord].values)
+    lon_vals = np.ravel(ds[lon_coord].values)
+    schema = (lat_coord, lon_coord,
+              bool(lat_vals[-1] >= lat_vals[0]), bool(lon_vals[-1] >= lon_vals[0]))
+    if short_name:
+        _COORD_CACHE[short_name] = schema
+    return schema
+
+
+def _index_range(values, low, high, ascending, target):
+    """Integer slice of a 1-D coordinate axis covering [low, high]"""
+    axis = values if ascending else values[::-1]
+    start = int(np.searchsorted(axis, low, side='left'))
+    stop = int(np.searchsorted(axis, high, side='right'))
+    if start >= stop:
+        # Range falls between pixels: use the nearest one
+        nearest = int(np.abs(values - target).argmin())
+        return slice(nearest, nearest + 1)
+    if not ascending:
+        start, stop = len(values) - stop, len(values) - start
+    return slice(start, stop)
+
+
+def _nanmean32(values):
+    """NaN-ignoring mean reduced in float32, ample precision for a regional average"""
+    return float(np.nanmean(np.asarray(values, dtype=np.float32)))
+
+
+def calculate_regional_mean(data, ds, short_name=None):
     """Calculate regional mean around target location"""
     try:
         lat, lon = CONFIG["location"]["lat"], CONFIG["location"]["lon"]
-
-        # Find coordinates
-        lat_coord = next((c for c in ds.coords if 'lat' in c.lower()), None)
-        lon_coord = next((c for c in ds.coords if 'lon' in c.lower()), None)
-
-        if lat_coord and lon_coord:
-            # Use bounding box for regional average
-            regional_data = data.sel(
-                {lat_coord: slice(CONFIG["location"]["bbox"][0], CONFIG["location"]["bbox"][2]),
-                 lon_coord: slice(CONFIG["location"]["bbox"][1], CONFIG["location"]["bbox"][3])}
-            )
-            return float(regional_data.mean().values)
-        else:
-            return float(data.mean().values)
+        south, west, north, east = CONFIG["location"]["bbox"]
+
+        schema = _coord_schema(ds, short_name)
+        if not schema:
+            return _nanmean32(data.values)
+
+        lat_coord, lon_coord, lat_ascending, lon_ascending = schema
+        lat_var, lon_var = ds[lat_coord], ds[lon_coord]
+
+        if (lat_var.ndim == 1 and lon_var.ndim == 1 and
+                lat_var.dims[0] in data.dims and lon_var.dims[0] in data.dims):
+            # Regular grid: bbox -> index window, only that window is read
+            window = data.isel({
+                lat_var.dims[0]: _index_range(lat_var.values, south, north, lat_ascending, lat),
+                lon_var.dims[0]: _index_range(lon_var.values, west, east, lon_ascending, lon),
+            })
+            return _nanmean32(window.values)
+
+        values = data.values
+        lat_vals, lon_vals = lat_var.values, lon_var.values
+        if lat_vals.shape == lon_vals.shape == values.shape[-lat_vals.ndim:]:
+            # Swath with 2-D geolocation: mask the pixels inside the bbox
+            mask = (lat_vals >= south) & (lat_vals <= north) & (lon_vals >= west) & (lon_vals <= east)
+            if not mask.any():
+                mask = np.zeros(lat_vals.shape, dtype=bool)
+                mask.flat[np.argmin((lat_vals - lat) ** 2 + (lon_vals - lon) ** 2)] = True
+            return _nanmean32(values[..., mask])
+
+        return _nanmean32(values)
 
     except:
-        return float(data.mean().values)
+        return _nanmean32(data.values)
 
 
 # ---------------------------
 # 8. GROUND STATION DATA WITH NEW API KEY
 # ---------------------------
-def get_ground_station_data():
+async def fetch_json(session, url, headers=None):
+    """GET a URL and return the decoded JSON body, or None on a non-200 status"""
+    async with session.get(url, headers=headers) as response:
+        if response.status != 200:
+            return None
+        return await response.json(content_type=None)
+
+
+async def get_ground_station_data(session):
     """Get ground-based air quality data using new API key"""
     try:
         lat, lon = CONFIG["location"]["lat"], CONFIG["location"]["lon"]
@@ -356,17 +601,12 @@ def get_ground_station_data():
 
         url = f"https://api.openaq.org/v2/latest?coordinates={lat},{lon}&radius=50000"
 
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return process_ground_data(data)
-        else:
+        data = await fetch_json(session, url, headers=headers)
+        if data is None:
             # Fallback to free API if key doesn't work
-            url_fallback = f"https://api.openaq.org/v2/latest?coordinates={lat},{lon}&radius=50000"
-            response_fallback = requests.get(url_fallback, timeout=10)
-            if response_fallback.status_code == 200:
-                data = response_fallback.json()
-                return process_ground_data(data)
+            data = await fetch_json(session, url)
+        if data is not None:
+            return process_ground_data(data)
 
     except Exception as e:
         logger.error(f"❌ Ground station error: {e}")
@@ -374,6 +614,13 @@ def get_ground_station_data():
     return []
 
 
+# OpenAQ parameter -> our pollutant type
+GROUND_POLLUTANTS = {
+    'PM25': 'PM2_5', 'PM10': 'PM2_5',
+    'NO2': 'NO2', 'O3': 'O3', 'SO2': 'SO2'
+}
+
+
 def process_ground_data(data):
     """Process ground station data"""
     results = []
@@ -381,30 +628,42 @@ def process_ground_data(data):
     try:
         # OpenAQ format
         if 'results' in data:
-            for station in data['results'][:3]:  # First 3 stations
-                for measurement in station.get('measurements', [])[:5]:  # First 5 parameters
-                    param = measurement['parameter'].upper()
-                    value = measurement['value']
-
-                    # Map to our pollutant types
-                    poll_map = {
-                        'PM25': 'PM2_5', 'PM10': 'PM2_5',
-                        'NO2': 'NO2', 'O3': 'O3', 'SO2': 'SO2'
-                    }
-
-                    if param in poll_map:
-                        rating, emoji, description = get_health_rating(poll_map[param], value)
-
-                        results.append({
-                            'pollutant': poll_map[param],
-                            'value': value,
-                            'units': measurement['unit'],
-                            'source': f"Ground Station: {station.get('location', 'Unknown')}",
-                            'rating': rating,
-                            'emoji': emoji,
-                            'description': description,
-                            'type': 'GROUND'
-                        })
+            import pandas as pd
+
+            # First 3 stations, first 5 parameters each
+            stations = [dict(station, measurements=station.get('measurements', [])[:5])
+                        for station in data['results'][:3]]
+            df = pd.json_normalize(stations, record_path='measurements',
+                                   meta=['location'], errors='ignore')
+            if df.empty:
+                return results
+
+            # Map to our pollutant types
+            df['pollutant'] = df['parameter'].str.upper().map(GROUND_POLLUTANTS)
+            df = df[df['pollutant'].notna()].copy()
+            df['location'] = df['location'].fillna('Unknown')
+
+            # Rate each pollutant group with one searchsorted call
+            df['rating'] = df['emoji'] = df['description'] = None
+            for pollutant, index in df.groupby('pollutant').groups.items():
+                ratings, emojis, descriptions = get_health_ratings(pollutant, df.loc[index, 'value'])
+                df.loc[index, 'rating'] = ratings
+                df.loc[index, 'emoji'] = emojis
+                df.loc[index, 'description'] = descriptions
+
+            results = [
+                {
+                    'pollutant': row.pollutant,
+                    'value': row.value,
+                    'units': row.unit,
+                    'source': f"Ground Station: {row.location}",
+                    'rating': row.rating,
+                    'emoji': row.emoji,
+                    'description': row.description,
+                    'type': 'GROUND'
+                }
+                for row in df.itertuples(index=False)
+            ]
 
     except Exception as e:
         logger.error(f"❌ Ground data processing error: {e}")
@@ -415,15 +674,14 @@ def process_ground_data(data):
 # ---------------------------
 # 9. WEATHER DATA
 # ---------------------------
-def get_weather_data():
+async def get_weather_data(session):
     """Get current weather conditions"""
     try:
         lat, lon = CONFIG["location"]["lat"], CONFIG["location"]["lon"]
         url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,relative_humidity_2m,pressure_msl,wind_speed_10m,wind_direction_10m,cloud_cover,visibility&temperature_unit=celsius&wind_speed_unit=ms"
 
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
+        data = await fetch_json(session, url)
+        if data is not None:
             current = data['current']
 
             # Calculate air quality index
@@ -445,6 +703,18 @@ def get_weather_data():
     return None
 
 
+async def fetch_surface_data():
+    """Fetch ground-station and weather data concurrently on one event loop"""
+    connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers=HTTP_HEADERS) as session:
+        ground_data, weather_data = await asyncio.gather(
+            get_ground_station_data(session), get_weather_data(session)
+        )
+    return ground_data, weather_data
+
+
 def calculate_aqi_from_weather(weather):
     """Estimate AQI from weather conditions"""
     score = 0
@@ -549,12 +819,28 @@ def display_results(satellite_data, ground_data, weather_data):
     print("=" * 100)
 
 
+GRANULE_EXTENSIONS = ('.nc', '.hdf', '.h5')
+
+
+def sweep_granules(directory):
+    """Delete leftover granule files; anything else in the directory is kept"""
+    os.makedirs(directory, exist_ok=True)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(GRANULE_EXTENSIONS):
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f"Could not remove {entry.path}: {e}")
+
+
 # ---------------------------
 # 11. MAIN EXECUTION
 # ---------------------------
 def main():
     logger.info("🚀 STARTING COMPREHENSIVE AIR QUALITY MONITORING WITH NEW API KEY")
-    os.makedirs(CONFIG['download_dir'], exist_ok=True)
+    # One sweep of leftovers from earlier runs instead of per-granule cleanup
+    sweep_granules(CONFIG['download_dir'])
 
     print(f"🔑 Using API Key: {NASA_EARTHDATA_API_KEY[:10]}...")
 
@@ -566,15 +852,17 @@ def main():
 
     logger.info("✅ New API Key configured successfully")
 
-    # Fetch all data sources
+    # Fetch all data sources concurrently (three independent hosts)
     print("🛰️  Fetching satellite data...")
-    satellite_data = fetch_nasa_data()
-
     print("🏢 Fetching ground station data...")
-    ground_data = get_ground_station_data()
-
     print("🌤️  Fetching weather data...")
-    weather_data = get_weather_data()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Satellite leg is blocking earthaccess I/O, keep it on a worker thread
+        satellite_future = executor.submit(fetch_nasa_data)
+        # Ground + weather REST calls share one aiohttp event loop meanwhile
+        ground_data, weather_data = asyncio.run(fetch_surface_data())
+        satellite_data = satellite_future.result()
+    _save_cache({"coord_schema": _COORD_CACHE, "engine": _ENGINE_CACHE})
 
     # Display results
     display_results(satellite_data, ground_data, weather_data)
@@ -583,22 +871,16 @@ def main():
     all_data = satellite_data + ground_data
     if all_data:
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M")
-        df = pd.DataFrame(all_data)
         filename = f"air_quality_detailed_{timestamp}.csv"
-        df.to_csv(filename, index=False)
+        # Satellite and ground records carry different keys, use their union
+        fieldnames = sorted({key for record in all_data for key in record})
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(all_data)
         logger.info(f"💾 Data saved: {filename}")
         print(f"\n💾 Detailed data saved to: {filename}")
 
 
-def cleanup_dir():
-    """Clean download directory"""
-    try:
-        for f in os.listdir(CONFIG['download_dir']):
-            if f.endswith(('.nc', '.hdf', '.h5')):
-                os.remove(os.path.join(CONFIG['download_dir'], f))
-    except:
-        os.makedirs(CONFIG['download_dir'], exist_ok=True)
-
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
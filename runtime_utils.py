@@ -0,0 +1,57 @@
+"""Runtime helpers shared by the SkyShield scripts and the API server"""
+import asyncio
+import threading
+import time
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba is optional: njit becomes a no-op decorator
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+
+def run_in_daemon(func, *args):
+    """Run a blocking call on a daemon thread and return an awaitable future.
+
+    Unlike asyncio.to_thread or a ThreadPoolExecutor, nothing joins the thread
+    at shutdown, so a cancelled await (Ctrl+C) never waits out a slow request
+    or its retry backoff.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(result, error):
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def worker():
+        result, error = None, None
+        try:
+            result = func(*args)
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(deliver, result, error)
+        except RuntimeError:
+            pass  # loop already closed after a stop
+
+    threading.Thread(target=worker, daemon=True).start()
+    return future
+
+
+def next_deadline(previous, interval):
+    """Return the monotonic deadline following previous for a fixed interval.
+
+    Scheduling from the previous deadline rather than from "now" keeps the
+    period from drifting; if a run overran, the missed slots are skipped
+    instead of firing back to back.
+    """
+    return max(previous + interval, time.monotonic())
@@ -45,8 +45,12 @@ Region: North America
 
 
 import os
+import argparse
+import math
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -54,6 +58,28 @@ import logging
 import sys
 import json
 import threading
+import asyncio
+import aiohttp
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from runtime_utils import HAS_NUMBA, njit, run_in_daemon
+
+# orjson parses API payloads several times faster; stdlib json also accepts bytes
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_line(obj):
+        """Serialize one record as a newline-terminated JSON line"""
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    json_loads = json.loads
+
+    def json_line(obj):
+        """Serialize one record as a newline-terminated JSON line"""
+        return (json.dumps(obj, ensure_ascii=False, default=float) + "\n").encode("utf-8")
 
 # ---------------------------
 # Setup logging
@@ -100,6 +126,10 @@ CONFIG = {
         "country": "USA"
     },
     "update_interval_minutes": 5,
+    "weather_cache_ttl_seconds": 600,  # weather barely moves between 5-minute cycles
+    "iqair_cache_ttl_seconds": 3600,  # IQAir station readings update about hourly
+    "force_refresh": False,  # --force-refresh: ignore cache freshness, always ask upstream
+    "rate_limits_qps": {"iqair": 2.0, "openweather": 5.0},
     "data_sources": {
         "iqair": "https://api.airvisual.com/v2/",
         "open_weather": "https://api.openweathermap.org/data/2.5/",
@@ -145,6 +175,41 @@ CONFIG = {
     ]
 }
 
+# Estimation adjustments by city name; cities not listed get the defaults
+PM25_ADJUSTMENTS = {
+    "New York": 8.0, "Los Angeles": 12.0, "Chicago": 6.0,
+    "Toronto": 5.0, "Vancouver": 3.0, "Mexico City": 18.0,
+    "Montreal": 4.0, "Houston": 9.0
+}
+CO2_ADJUSTMENTS = {
+    "New York": 25, "Los Angeles": 30, "Chicago": 20,
+    "Toronto": 15, "Vancouver": 10, "Mexico City": 35,
+    "Montreal": 18, "Houston": 22
+}
+TEMP_ADJUSTMENTS = {
+    "Los Angeles": 8, "Mexico City": 5, "Houston": 7,
+    "Vancouver": -2, "Toronto": -3, "Montreal": -4
+}
+DEFAULT_PM25_ADJ, DEFAULT_CO2_ADJ, DEFAULT_TEMP_ADJ = 7.0, 20, 0
+
+# Per-city static table, built once: configured cities plus their estimation
+# adjustments looked up by name, rows in north_america_cities order
+CITIES_DF = pd.DataFrame(CONFIG["north_america_cities"]).set_index("city")
+CITIES_DF["pm25_adj"] = CITIES_DF.index.map(PM25_ADJUSTMENTS).fillna(DEFAULT_PM25_ADJ).astype(np.float64)
+CITIES_DF["co2_adj"] = CITIES_DF.index.map(CO2_ADJUSTMENTS).fillna(DEFAULT_CO2_ADJ).astype(np.int64)
+CITIES_DF["temp_adj"] = CITIES_DF.index.map(TEMP_ADJUSTMENTS).fillna(DEFAULT_TEMP_ADJ).astype(np.int64)
+
+# Column views (structure of arrays) for the per-city hot path, indexed by city_id()
+PM25_ADJ = CITIES_DF["pm25_adj"].to_numpy()
+CO2_ADJ = CITIES_DF["co2_adj"].to_numpy()
+TEMP_ADJ = CITIES_DF["temp_adj"].to_numpy()
+
+_CITY_ID = {(c["city"], c["country"]): i for i, c in enumerate(CONFIG["north_america_cities"])}
+
+def city_id(city_info):
+    """Row of a city in the per-city arrays, None if it is not configured"""
+    return _CITY_ID.get((city_info["city"], city_info["country"]))
+
 # ---------------------------
 # HEALTH THRESHOLDS
 # ---------------------------
@@ -175,103 +240,246 @@ HEALTH_THRESHOLDS = {
     }
 }
 
+# Per-pollutant band edges; get_health_rating bisects these and reads the
+# matching [G]/[M]/[U]/[VU] label from _LABELS
+_THRESH = {
+    p: np.array([t["GOOD"], t["MODERATE"], t["BAD"]], dtype=np.float64)
+    for p, t in HEALTH_THRESHOLDS.items()
+}
+_LABELS = {
+    p: (("GOOD", "[G]", t["GOOD_DESC"]),
+        ("MODERATE", "[M]", t["MODERATE_DESC"]),
+        ("UNHEALTHY", "[U]", t["BAD_DESC"]),
+        ("VERY UNHEALTHY", "[VU]", "Dangerous pollution levels"))
+    for p, t in HEALTH_THRESHOLDS.items()
+}
+_UNKNOWN_RATING = ("UNKNOWN", "[?]", "No rating available")
+_UNHEALTHY_RATINGS = frozenset({'UNHEALTHY', 'VERY UNHEALTHY', 'POOR'})
+
 # Global variables
-current_data = []
-weather_data = {}
-monitoring_active = True
 run_count = 0
 
+# Shared HTTP session: keep-alive connections reused across cities and cycles
+SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                       # No 429: retrying a throttled free-tier key only burns quota,
+                       # the fallback estimators cover those cities instead
+                       max_retries=Retry(total=3, backoff_factor=0.3,
+                                         status_forcelist=[500, 502, 503, 504]))
+SESSION.mount("https://", _ADAPTER)
+SESSION.mount("http://", _ADAPTER)  # IQAir city endpoint is plain http
+# (connect, read): fail fast on unreachable hosts, allow slower responses
+HTTP_TIMEOUT = (3, 10)
+
+# (lat, lon) -> (fetched_at, etag, raw payload) for OpenWeather responses
+_WEATHER_CACHE = {}
+# (city, country) -> (fetched_at, etag, raw payload) for IQAir responses
+_IQAIR_CACHE = {}
+_IQAIR_CACHE_LOCK = threading.Lock()
+
+class Bucket:
+    """Per-host rate limiter: callers only wait once the request rate is exceeded"""
+
+    def __init__(self, qps):
+        self.qps = qps
+        self.next = 0.0
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """Claim the next request slot and return how long to wait for it"""
+        with self.lock:
+            now = time.monotonic()
+            wait = max(0.0, self.next - now)
+            self.next = max(now, self.next) + 1.0 / self.qps
+        return wait
+
+    def acquire(self):
+        """Blocking acquire for worker threads"""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Acquire for coroutines, yields to the event loop while waiting"""
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+# One limiter per API host (replaces the blanket 1s sleep per city)
+_BUCKETS = {
+    "iqair": Bucket(CONFIG["rate_limits_qps"]["iqair"]),
+    "openweather": Bucket(CONFIG["rate_limits_qps"]["openweather"])
+}
+
+# Without a key a request can only come back 401, so skip it entirely
+_HAS_IQAIR = bool(CONFIG["api_keys"]["iqair"])
+_HAS_OPENWEATHER = bool(CONFIG["api_keys"]["openweather"])
+
+IQAIR_CITY_URL = "http://api.airvisual.com/v2/city"
+IQAIR_CONCURRENCY = 4
+# Upper bound on simultaneous outbound connections per collection cycle
+HTTP_CONCURRENCY = 16
+
+# ---------------------------
+# MEASUREMENT RECORDS
+# ---------------------------
+@dataclass(slots=True)
+class Reading:
+    """One air quality measurement (slots: no per-row __dict__)"""
+    pollutant: str
+    value: float
+    units: str
+    source: str
+    rating: str
+    indicator: str
+    description: str
+    city: str
+    country: str
+    timestamp: str
+    aqi: Optional[int] = None
+    note: Optional[str] = None
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """Readings and weather (keyed "City_Country") of one completed collection cycle"""
+    weather: dict
+    readings: list
+
+# Swapped as a whole once a cycle completes; readers take one reference
+# and never see a half-built cycle
+_SNAPSHOT = Snapshot(weather={}, readings=[])
+_SNAPSHOT_LOCK = threading.Lock()
+
+def get_snapshot():
+    """Latest completed collection cycle"""
+    return _SNAPSHOT
+
 # ---------------------------
 # AQI HELPER FUNCTIONS
 # ---------------------------
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def cycle_timestamp():
+    """Formatted current time, computed once per collection cycle"""
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+# Upper edge (inclusive) of each US AQI category and its
+# (description, rating, indicator); the last row covers everything above 300
+_AQI_BANDS = np.array([50, 100, 150, 200, 300])
+_AQI_TABLE = (
+    ("(Good)", "GOOD", "[G]"),
+    ("(Moderate)", "MODERATE", "[M]"),
+    ("(Unhealthy for Sensitive Groups)", "UNHEALTHY FOR SENSITIVE GROUPS", "[USG]"),
+    ("(Unhealthy)", "UNHEALTHY", "[U]"),
+    ("(Very Unhealthy)", "VERY UNHEALTHY", "[VU]"),
+    ("(Hazardous)", "HAZARDOUS", "[H]")
+)
+
+# Every integer AQI 0-500 classified up front; ceil keeps the inclusive
+# upper edges right for fractional values such as the summary average
+_AQI_CLASS = tuple(_AQI_TABLE[i] for i in np.searchsorted(_AQI_BANDS, np.arange(501), side='left'))
+
+def classify_aqi(aqi):
+    """(description, rating, indicator) for an AQI value in one lookup"""
+    if 0 <= aqi <= 500:
+        return _AQI_CLASS[math.ceil(aqi)]
+    # Out-of-range, infinite and NaN values keep the band search's placement
+    return _AQI_TABLE[int(np.searchsorted(_AQI_BANDS, aqi, side='left'))]
+
 def get_aqi_description(aqi_value):
     """Get descriptive text for AQI values"""
-    if aqi_value <= 50:
-        return "(Good)"
-    elif aqi_value <= 100:
-        return "(Moderate)"
-    elif aqi_value <= 150:
-        return "(Unhealthy for Sensitive Groups)"
-    elif aqi_value <= 200:
-        return "(Unhealthy)"
-    elif aqi_value <= 300:
-        return "(Very Unhealthy)"
-    else:
-        return "(Hazardous)"
+    return classify_aqi(aqi_value)[0]
 
 def get_aqi_rating(aqi):
     """Get rating for AQI value"""
-    if aqi <= 50:
-        return "GOOD"
-    elif aqi <= 100:
-        return "MODERATE"
-    elif aqi <= 150:
-        return "UNHEALTHY FOR SENSITIVE GROUPS"
-    elif aqi <= 200:
-        return "UNHEALTHY"
-    elif aqi <= 300:
-        return "VERY UNHEALTHY"
-    else:
-        return "HAZARDOUS"
+    return classify_aqi(aqi)[1]
 
 def get_aqi_indicator(aqi):
     """Get indicator for AQI value"""
-    if aqi <= 50:
-        return "[G]"
-    elif aqi <= 100:
-        return "[M]"
-    elif aqi <= 150:
-        return "[USG]"
-    elif aqi <= 200:
-        return "[U]"
-    elif aqi <= 300:
-        return "[VU]"
-    else:
-        return "[H]"
+    return classify_aqi(aqi)[2]
+
+# EPA PM2.5 breakpoints: upper edge of each band (inclusive) and the
+# (concentration, AQI) line it interpolates along
+_PM_UPPER = np.array([12.0, 35.4, 55.4, 150.4, 250.4])
+_PM_LO = np.array([0.0, 12.1, 35.5, 55.5, 150.5, 250.5])
+_PM_HI = np.array([12.0, 35.4, 55.4, 150.4, 250.4, 500.4])
+_AQI_LO = np.array([0, 51, 101, 151, 201, 301], dtype=float)  # first band starts at 0, not 1
+_AQI_HI = np.array([50, 100, 150, 200, 300, 500], dtype=float)
+# Reverse direction only distinguishes the first four bands; numerator and
+# denominator stay separate so results round exactly like (a * b) / c did
+_AQI_UPPER = np.array([50, 100, 150], dtype=float)
+_PM_SPAN = np.array([12.0, 35.4 - 12.1, 55.4 - 35.5, 150.4 - 55.5])
+_AQI_SPAN = np.array([50, 49, 49, 49], dtype=float)
+
+@njit(cache=True)
+def pm25_aqi_vec(pm25):
+    """Compiled PM2.5 -> AQI breakpoint ladder over a 1-D float64 array"""
+    out = np.empty(pm25.shape[0], np.int64)
+    n_bands = _PM_UPPER.shape[0]
+    for i in range(pm25.shape[0]):
+        v = pm25[i]
+        if not np.isfinite(v):
+            out[i] = 0  # same as the scalar conversion's error fallback
+            continue
+        band = 0
+        while band < n_bands and v > _PM_UPPER[band]:
+            band += 1
+        out[i] = int(_AQI_LO[band] + (v - _PM_LO[band]) * (_AQI_HI[band] - _AQI_LO[band])
+                     / (_PM_HI[band] - _PM_LO[band]))
+    return out
 
 def pm25_to_aqi(pm25):
-    """Convert PM2.5 concentration to AQI value"""
+    """Convert PM2.5 concentration to AQI value (scalar or array)"""
     try:
-        if pm25 <= 12.0:
-            return int((pm25 * 50) / 12.0)
-        elif pm25 <= 35.4:
-            return int(51 + (pm25 - 12.1) * (100 - 51) / (35.4 - 12.1))
-        elif pm25 <= 55.4:
-            return int(101 + (pm25 - 35.5) * (150 - 101) / (55.4 - 35.5))
-        elif pm25 <= 150.4:
-            return int(151 + (pm25 - 55.5) * (200 - 151) / (150.4 - 55.5))
-        elif pm25 <= 250.4:
-            return int(201 + (pm25 - 150.5) * (300 - 201) / (250.4 - 150.5))
+        values = np.asarray(pm25, dtype=float)
+        if HAS_NUMBA:
+            aqi = pm25_aqi_vec(values.ravel()).reshape(values.shape)
         else:
-            return int(301 + (pm25 - 250.5) * (500 - 301) / (500.4 - 250.5))
+            # Without numba the ladder would run in Python; search the bands in NumPy instead
+            finite = np.isfinite(values)
+            safe = np.where(finite, values, 0.0)
+            idx = np.searchsorted(_PM_UPPER, safe, side='left')
+            aqi = _AQI_LO[idx] + (safe - _PM_LO[idx]) * (_AQI_HI[idx] - _AQI_LO[idx]) / (_PM_HI[idx] - _PM_LO[idx])
+            # NaN/inf rate 0, as the scalar conversion's error fallback did
+            aqi = np.where(finite, np.trunc(aqi), 0).astype(int)
+        return int(aqi) if np.isscalar(pm25) else aqi
     except Exception as e:
-        logger.error(f"PM2.5 to AQI conversion error: {e}")
+        logger.error("PM2.5 to AQI conversion error: %s", e)
         return 0
 
 # ---------------------------
 # WEATHER DATA FUNCTIONS
 # ---------------------------
-def get_weather_data(city_info):
+def get_weather_data(city_info, cycle_ts=None, now=None):
     """Get comprehensive weather data for a city"""
     try:
         # Method 1: OpenWeatherMap (primary)
-        weather = get_openweather_data(city_info)
+        weather = get_openweather_data(city_info, cycle_ts)
         if weather:
             return weather
 
         # Method 2: Fallback to simple weather estimation
-        return get_basic_weather_estimation(city_info)
+        return get_basic_weather_estimation(city_info, cycle_ts, now)
 
     except Exception as e:
-        logger.error(f"Weather data error for {city_info['city']}: {e}")
-        return get_basic_weather_estimation(city_info)
+        logger.error("Weather data error for %s: %s", city_info['city'], e)
+        return get_basic_weather_estimation(city_info, cycle_ts, now)
 
-def get_openweather_data(city_info):
+def get_openweather_data(city_info, cycle_ts=None):
     """Get weather data from OpenWeatherMap"""
+    if not _HAS_OPENWEATHER:
+        return None
     try:
         api_key = CONFIG["api_keys"]["openweather"]
         lat, lon = city_info["lat"], city_info["lon"]
 
+        # Serve a fresh cached observation without touching the network
+        fetched_at, etag, cached = _WEATHER_CACHE.get((lat, lon), (0, None, None))
+        # Payloads are cached raw and re-processed so records carry this cycle's timestamp
+        if (cached and not CONFIG["force_refresh"]
+                and time.time() - fetched_at < CONFIG["weather_cache_ttl_seconds"]):
+            return process_openweather_data(cached, city_info, cycle_ts)
+
         url = "https://api.openweathermap.org/data/2.5/weather"
         params = {
             'lat': lat,
@@ -279,22 +487,32 @@ def get_openweather_data(city_info):
             'appid': api_key,
             'units': 'metric'
         }
-
-        response = requests.get(url, params=params, timeout=10)
+        # Conditional GET: an unchanged observation comes back as an empty 304
+        headers = {'If-None-Match': etag} if cached and etag else None
+
+        _BUCKETS["openweather"].acquire()
+        response = SESSION.get(url, params=params, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code == 304 and cached:
+            _WEATHER_CACHE[(lat, lon)] = (time.time(), etag, cached)
+            return process_openweather_data(cached, city_info, cycle_ts)
         if response.status_code == 200:
-            data = response.json()
-            return process_openweather_data(data, city_info)
+            data = json_loads(response.content)
+            weather = process_openweather_data(data, city_info, cycle_ts)
+            if weather:
+                _WEATHER_CACHE[(lat, lon)] = (time.time(), response.headers.get('ETag'), data)
+            return weather
         else:
-            logger.warning(f"OpenWeather API status {response.status_code} for {city_info['city']}")
+            logger.warning("OpenWeather API status %s for %s", response.status_code, city_info['city'])
             return None
 
     except Exception as e:
-        logger.error(f"OpenWeather error for {city_info['city']}: {e}")
+        logger.error("OpenWeather error for %s: %s", city_info['city'], e)
         return None
 
-def process_openweather_data(data, city_info):
+def process_openweather_data(data, city_info, cycle_ts=None):
     """Process OpenWeatherMap API response"""
     try:
+        ts = cycle_ts or cycle_timestamp()
         main = data.get('main', {})
         weather_info = data.get('weather', [{}])[0]
         wind = data.get('wind', {})
@@ -321,55 +539,93 @@ def process_openweather_data(data, city_info):
             'sunset': sys.get('sunset'),
             'aqi_impact': aqi_impact,  # Now numeric score
             'source': 'OpenWeatherMap',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': ts
         }
 
-        logger.info(f"Weather data collected for {city_info['city']}")
+        logger.info("Weather data collected for %s", city_info['city'])
         return weather_data
 
     except Exception as e:
-        logger.error(f"OpenWeather processing error: {e}")
+        logger.error("OpenWeather processing error: %s", e)
         return None
 
-def calculate_weather_aqi_impact(weather_data):
-    """Calculate how weather conditions affect air quality - returns score 0-100"""
+# IQAir weather icon code prefix -> (main, description, approximate cloud cover %)
+_IQAIR_ICONS = {
+    "01": ("Clear", "clear sky", 0),
+    "02": ("Clouds", "few clouds", 20),
+    "03": ("Clouds", "scattered clouds", 50),
+    "04": ("Clouds", "broken clouds", 85),
+    "09": ("Rain", "shower rain", 90),
+    "10": ("Rain", "rain", 90),
+    "11": ("Thunderstorm", "thunderstorm", 90),
+    "13": ("Snow", "snow", 90),
+    "50": ("Mist", "mist", 90)
+}
+
+def process_iqair_weather(data, city_info, cycle_ts=None):
+    """Weather from the block IQAir returns alongside pollution, None if absent"""
     try:
-        score = 0
-        max_possible_score = 75  # Maximum negative impact score
-
-        # Wind speed - higher wind disperses pollutants (lower score is better)
-        wind_speed = weather_data.get('wind', {}).get('speed', 0)
-        if wind_speed < 2:
-            score += 30  # Poor dispersion
-        elif wind_speed < 5:
-            score += 15  # Moderate dispersion
-        else:
-            score += 5   # Good dispersion
+        weather = (data.get('data') or {}).get('current', {}).get('weather') or {}
+        if weather.get('tp') is None:
+            return None
 
-        # Humidity - high humidity can trap pollutants
-        humidity = weather_data.get('main', {}).get('humidity', 50)
-        if humidity > 80:
-            score += 20
-        elif humidity > 60:
-            score += 10
+        ts = cycle_ts or cycle_timestamp()
+        main, description, clouds = _IQAIR_ICONS.get(str(weather.get('ic', ''))[:2],
+                                                      ("Unknown", "unknown", 0))
+        wind_speed = weather.get('ws')
+        humidity = weather.get('hu')
+
+        return {
+            'city': city_info['city'],
+            'country': city_info['country'],
+            'temperature': weather['tp'],
+            'humidity': humidity,
+            'pressure': weather.get('pr'),
+            'wind_speed': wind_speed,
+            'wind_direction': weather.get('wd'),
+            'cloudiness': clouds,
+            'weather_main': main,
+            'weather_description': description,
+            'aqi_impact': int(weather_aqi_impacts(
+                wind_speed if wind_speed is not None else 0,
+                humidity if humidity is not None else 50,
+                weather['tp'], clouds)),
+            'source': 'IQAir',
+            'timestamp': ts
+        }
 
-        # Temperature inversion conditions (cold air trapped under warm)
-        temp = weather_data.get('main', {}).get('temp', 15)
-        if temp < 5:
-            score += 15  # More likely inversion
+    except Exception as e:
+        logger.warning("IQAir weather processing error: %s", e)
+        return None
 
-        # Cloud cover - can trap pollutants
-        clouds = weather_data.get('clouds', {}).get('all', 0)
-        if clouds > 80:
-            score += 10
+def weather_aqi_impacts(wind_speed, humidity, temp, clouds):
+    """Vectorized weather impact score 0-100 for arrays of conditions (0 is best)"""
+    wind_speed, humidity = np.asarray(wind_speed, dtype=float), np.asarray(humidity, dtype=float)
+    temp, clouds = np.asarray(temp, dtype=float), np.asarray(clouds, dtype=float)
 
-        # Convert to 0-100 scale where 0 is best, 100 is worst
-        impact_score = min(100, int((score / max_possible_score) * 100))
+    # Wind disperses pollutants, humidity and cloud cover trap them,
+    # cold air makes an inversion more likely
+    score = (np.where(wind_speed < 2, 30, np.where(wind_speed < 5, 15, 5)) +
+             np.where(humidity > 80, 20, np.where(humidity > 60, 10, 0)) +
+             np.where(temp < 5, 15, 0) +
+             np.where(clouds > 80, 10, 0))
 
-        return impact_score
+    # Out of a maximum negative impact score of 75
+    return np.minimum(100, score * 100 // 75).astype(np.int16)
+
+def calculate_weather_aqi_impact(weather_data):
+    """Calculate how weather conditions affect air quality - returns score 0-100"""
+    try:
+        impact = weather_aqi_impacts(
+            weather_data.get('wind', {}).get('speed', 0),
+            weather_data.get('main', {}).get('humidity', 50),
+            weather_data.get('main', {}).get('temp', 15),
+            weather_data.get('clouds', {}).get('all', 0)
+        )
+        return int(impact)
 
     except Exception as e:
-        logger.error(f"AQI impact calculation error: {e}")
+        logger.error("AQI impact calculation error: %s", e)
         return 50  # Default neutral score
 
 def display_weather_impact(impact_score):
@@ -385,10 +641,11 @@ def display_weather_impact(impact_score):
     else:
         return f"🔴 {impact_score}/100 - Very poor dispersion"
 
-def get_basic_weather_estimation(city_info):
-    """Fallback weather estimation based on location and time"""
+def get_basic_weather_estimation(city_info, cycle_ts=None, now=None):
+    """Fallback weather estimation based on location and time (now: the cycle's clock)"""
     try:
-        now = datetime.now()
+        ts = cycle_ts or cycle_timestamp()
+        now = now or datetime.now()
         month = now.month
         hour = now.hour
 
@@ -411,12 +668,8 @@ def get_basic_weather_estimation(city_info):
         estimated_temp = base_temp + temp_adjustment
 
         # City-specific adjustments
-        city_temp_adjustments = {
-            "Los Angeles": 8, "Mexico City": 5, "Houston": 7,
-            "Vancouver": -2, "Toronto": -3, "Montreal": -4
-        }
-
-        estimated_temp += city_temp_adjustments.get(city_info['city'], 0)
+        cid = city_id(city_info)
+        estimated_temp += int(TEMP_ADJ[cid]) if cid is not None else DEFAULT_TEMP_ADJ
 
         # Simple weather condition based on season and time
         if month in [6, 7, 8]:  # Summer
@@ -445,12 +698,12 @@ def get_basic_weather_estimation(city_info):
             'weather_description': f'{condition} skies',
             'aqi_impact': impact_score,  # Changed from 'NEUTRAL' to numeric score
             'source': 'Estimated',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': ts,
             'note': 'Estimated weather data'
         }
 
     except Exception as e:
-        logger.error(f"Weather estimation error: {e}")
+        logger.error("Weather estimation error: %s", e)
         return None
 
 # ---------------------------
@@ -458,58 +711,82 @@ def get_basic_weather_estimation(city_info):
 # ---------------------------
 def get_health_rating(pollutant_type, value):
     """Get health rating for a pollutant value"""
-    if pollutant_type not in HEALTH_THRESHOLDS:
-        return "UNKNOWN", "[?]", "No rating available"
-
-    thresholds = HEALTH_THRESHOLDS[pollutant_type]
+    if pollutant_type not in _THRESH:
+        return _UNKNOWN_RATING
+    return _LABELS[pollutant_type][int(np.searchsorted(_THRESH[pollutant_type], value, side='left'))]
+
+async def _fetch_iqair(session, sem, city_info):
+    """Raw IQAir payload for one city, None on failure"""
+    city, country = city_info["city"], city_info["country"]
+    params = {
+        'city': city,
+        'state': city_info["state"],
+        'country': country,
+        'key': CONFIG["api_keys"]["iqair"]
+    }
 
-    if value <= thresholds["GOOD"]:
-        return "GOOD", "[G]", thresholds["GOOD_DESC"]
-    elif value <= thresholds["MODERATE"]:
-        return "MODERATE", "[M]", thresholds["MODERATE_DESC"]
-    elif value <= thresholds["BAD"]:
-        return "UNHEALTHY", "[U]", thresholds["BAD_DESC"]
-    else:
-        return "VERY UNHEALTHY", "[VU]", "Dangerous pollution levels"
+    # Serve a payload fetched within the TTL without touching the network
+    with _IQAIR_CACHE_LOCK:
+        fetched_at, etag, cached = _IQAIR_CACHE.get((city, country), (0, None, None))
+    if (cached and not CONFIG["force_refresh"]
+            and time.time() - fetched_at < CONFIG["iqair_cache_ttl_seconds"]):
+        return cached
+    # Conditional GET: an unchanged reading comes back as an empty 304
+    headers = {'If-None-Match': etag} if cached and etag else None
 
-def get_iqair_city_data(city_info):
-    """Get air quality data for a specific city from IQAir"""
     try:
-        api_key = CONFIG["api_keys"]["iqair"]
-        city = city_info["city"]
-        state = city_info["state"]
-        country = city_info["country"]
-
-        url = "http://api.airvisual.com/v2/city"
-        params = {
-            'city': city,
-            'state': state,
-            'country': country,
-            'key': api_key
-        }
-
-        logger.info(f"Fetching air quality data for {city}, {country}")
-        response = requests.get(url, params=params, timeout=15)
+        async with sem:
+            logger.info("Fetching air quality data for %s, %s", city, country)
+            await _BUCKETS["iqair"].acquire_async()
+            async with session.get(IQAIR_CITY_URL, params=params, headers=headers) as response:
+                if response.status == 304 and cached:
+                    with _IQAIR_CACHE_LOCK:
+                        _IQAIR_CACHE[(city, country)] = (time.time(), etag, cached)
+                    return cached
+                if response.status == 200:
+                    payload = json_loads(await response.read())
+                    with _IQAIR_CACHE_LOCK:
+                        _IQAIR_CACHE[(city, country)] = (time.time(), response.headers.get('ETag'), payload)
+                    return payload
+                logger.warning("API returned status %s for %s", response.status, city)
+                return None
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error("Network error for %s: %s", city, e)
+        return None
+    except Exception as e:
+        logger.error("Unexpected error for %s: %s", city, e)
+        return None
 
-        if response.status_code == 200:
-            data = response.json()
-            return process_iqair_response(data, city_info)
-        else:
-            logger.warning(f"API returned status {response.status_code} for {city}")
-            return []
+async def fetch_iqair_all(cities):
+    """IQAir payloads for all cities, fetched concurrently on one event loop"""
+    if not _HAS_IQAIR:
+        return [None] * len(cities)
+    # Bounded so the per-key QPS limit is respected
+    sem = asyncio.Semaphore(IQAIR_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=15)
+    connector = aiohttp.TCPConnector(limit=HTTP_CONCURRENCY, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        return await asyncio.gather(*(_fetch_iqair(session, sem, city) for city in cities))
+
+def get_iqair_city_data(city_info, cycle_ts=None):
+    """Get air quality data for a specific city from IQAir"""
+    data = asyncio.run(fetch_iqair_all([city_info]))[0]
+    return process_iqair_response(data, city_info, cycle_ts) if data else []
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Network error for {city_info['city']}: {e}")
-        return []
-    except Exception as e:
-        logger.error(f"Unexpected error for {city_info['city']}: {e}")
-        return []
+# (pollutant, IQAir pollution field, units) for each reading taken from a payload
+_POLLUTANT_SPECS = (
+    ("PM2_5", "p2", "μg/m³"),
+    ("O3", "o3", "ppb"),
+    ("NO2", "no2", "ppb")
+)
 
-def process_iqair_response(data, city_info):
+def process_iqair_response(data, city_info, cycle_ts=None):
     """Process IQAir API response with enhanced AQI and PM2.5 data"""
     results = []
 
     try:
+        ts = cycle_ts or cycle_timestamp()
         if 'data' in data and 'current' in data['data']:
             current = data['data']['current']
             pollution = current.get('pollution', {})
@@ -528,101 +805,66 @@ def process_iqair_response(data, city_info):
             if pm25_concentration > 0 and aqius == 0:
                 aqius = pm25_to_aqi(pm25_concentration)
 
-            # Always create PM2.5 entry if we have data
-            if pm25_concentration > 0:
-                rating, indicator, description = get_health_rating("PM2_5", pm25_concentration)
-
-                # Enhanced PM2.5 entry
-                results.append({
-                    'pollutant': 'PM2_5',
-                    'value': pm25_concentration,
-                    'units': 'μg/m³',
-                    'source': f'IQAir - {city_name}',
-                    'rating': rating,
-                    'indicator': indicator,
-                    'description': description,
-                    'aqi': aqius,
-                    'city': city_info['city'],
-                    'country': city_info['country'],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-
-                # Also create a separate AQI entry for easy access
-                if aqius > 0:
-                    results.append({
-                        'pollutant': 'US_AQI',
-                        'value': aqius,
-                        'units': 'AQI',
-                        'source': f'IQAir - {city_name}',
-                        'rating': get_aqi_rating(aqius),
-                        'indicator': get_aqi_indicator(aqius),
-                        'description': get_aqi_description(aqius),
-                        'city': city_info['city'],
-                        'country': city_info['country'],
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    })
-
-            # Process O3 if available
-            if pollution.get('o3'):
-                o3_value = pollution['o3']
-                rating, indicator, description = get_health_rating("O3", o3_value)
-                results.append({
-                    'pollutant': 'O3',
-                    'value': o3_value,
-                    'units': 'ppb',
-                    'source': f'IQAir - {city_name}',
-                    'rating': rating,
-                    'indicator': indicator,
-                    'description': description,
-                    'city': city_info['city'],
-                    'country': city_info['country'],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-
-            # Process NO2 if available
-            if pollution.get('no2'):
-                no2_value = pollution['no2']
-                rating, indicator, description = get_health_rating("NO2", no2_value)
-                results.append({
-                    'pollutant': 'NO2',
-                    'value': no2_value,
-                    'units': 'ppb',
-                    'source': f'IQAir - {city_name}',
-                    'rating': rating,
-                    'indicator': indicator,
-                    'description': description,
-                    'city': city_info['city'],
-                    'country': city_info['country'],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+            # One reading per pollutant present; PM2.5 uses the reconciled value
+            measured = dict(pollution, p2=pm25_concentration)
+            for pollutant, key, units in _POLLUTANT_SPECS:
+                value = measured.get(key)
+                if not value or value < 0:
+                    continue
+                rating, indicator, description = get_health_rating(pollutant, value)
+                results.append(Reading(
+                    pollutant=pollutant,
+                    value=value,
+                    units=units,
+                    source=f'IQAir - {city_name}',
+                    rating=rating,
+                    indicator=indicator,
+                    description=description,
+                    aqi=aqius if pollutant == 'PM2_5' else None,
+                    city=city_info['city'],
+                    country=city_info['country'],
+                    timestamp=ts
+                ))
+
+            # Also create a separate AQI entry for easy access
+            if pm25_concentration > 0 and aqius > 0:
+                aqi_description, aqi_rating, aqi_indicator = classify_aqi(aqius)
+                results.append(Reading(
+                    pollutant='US_AQI',
+                    value=aqius,
+                    units='AQI',
+                    source=f'IQAir - {city_name}',
+                    rating=aqi_rating,
+                    indicator=aqi_indicator,
+                    description=aqi_description,
+                    city=city_info['city'],
+                    country=city_info['country'],
+                    timestamp=ts
+                ))
 
     except Exception as e:
-        logger.error(f"Error processing IQAir data: {e}")
+        logger.error("Error processing IQAir data: %s", e)
 
     return results
 
-def get_fallback_pm25(city_info):
+def get_fallback_pm25(city_info, cycle_ts=None, now=None):
     """Create fallback PM2.5 estimation when API fails"""
     try:
+        ts = cycle_ts or cycle_timestamp()
         # Base PM2.5 levels with city adjustments
         base_pm25 = 15.0
-        city_adjustments = {
-            "New York": 8.0, "Los Angeles": 12.0, "Chicago": 6.0,
-            "Toronto": 5.0, "Vancouver": 3.0, "Mexico City": 18.0,
-            "Montreal": 4.0, "Houston": 9.0
-        }
-
-        adjustment = city_adjustments.get(city_info["city"], 7.0)
-        current_hour = datetime.now().hour
+        cid = city_id(city_info)
+        adjustment = float(PM25_ADJ[cid]) if cid is not None else DEFAULT_PM25_ADJ
+        current_hour = (now or datetime.now()).hour
 
         # Rush hour adjustment
         if 7 <= current_hour <= 9 or 16 <= current_hour <= 18:
             adjustment += 5.0
 
-        # Weather impact adjustment
-        city_key = f"{city_info['city']}_{city_info['country']}"
-        if city_key in weather_data:
-            weather_impact = weather_data[city_key].get('aqi_impact', 50)
+        # Weather impact adjustment (latest completed cycle)
+        city_weather = get_snapshot().weather.get(f"{city_info['city']}_{city_info['country']}")
+        if city_weather:
+            weather_impact = city_weather.get('aqi_impact', 50)
             # Higher impact score = worse dispersion = higher PM2.5
             if weather_impact > 70:
                 adjustment += 8.0
@@ -635,38 +877,34 @@ def get_fallback_pm25(city_info):
         estimated_aqi = pm25_to_aqi(estimated_pm25)
         rating, indicator, description = get_health_rating("PM2_5", estimated_pm25)
 
-        return {
-            'pollutant': 'PM2_5',
-            'value': estimated_pm25,
-            'units': 'μg/m³',
-            'source': f'Estimated - {city_info["city"]}',
-            'rating': rating,
-            'indicator': indicator,
-            'description': description,
-            'aqi': estimated_aqi,
-            'city': city_info['city'],
-            'country': city_info['country'],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'note': 'Estimated PM2.5 based on location and conditions'
-        }
+        return Reading(
+            pollutant='PM2_5',
+            value=estimated_pm25,
+            units='μg/m³',
+            source=f'Estimated - {city_info["city"]}',
+            rating=rating,
+            indicator=indicator,
+            description=description,
+            aqi=estimated_aqi,
+            city=city_info['city'],
+            country=city_info['country'],
+            timestamp=ts,
+            note='Estimated PM2.5 based on location and conditions'
+        )
 
     except Exception as e:
-        logger.error(f"Fallback PM2.5 estimation error: {e}")
+        logger.error("Fallback PM2.5 estimation error: %s", e)
         return None
 
-def get_co2_estimation(city_info):
+def get_co2_estimation(city_info, cycle_ts=None, now=None):
     """Get estimated CO2 levels for a city"""
     try:
+        ts = cycle_ts or cycle_timestamp()
         # Base CO2 level with city adjustments
         base_co2 = 420
-        city_adjustments = {
-            "New York": 25, "Los Angeles": 30, "Chicago": 20,
-            "Toronto": 15, "Vancouver": 10, "Mexico City": 35,
-            "Montreal": 18, "Houston": 22
-        }
-
-        adjustment = city_adjustments.get(city_info["city"], 20)
-        current_hour = datetime.now().hour
+        cid = city_id(city_info)
+        adjustment = int(CO2_ADJ[cid]) if cid is not None else DEFAULT_CO2_ADJ
+        current_hour = (now or datetime.now()).hour
 
         # Rush hour adjustment
         if 7 <= current_hour <= 9 or 16 <= current_hour <= 18:
@@ -684,143 +922,283 @@ def get_co2_estimation(city_info):
         else:
             rating, indicator, desc = "POOR", "[P]", "High CO2 concentration"
 
-        return {
-            'pollutant': 'CO2',
-            'value': estimated_co2,
-            'units': 'ppm',
-            'source': f'CO2 Estimate - {city_info["city"]}',
-            'rating': rating,
-            'indicator': indicator,
-            'description': desc,
-            'city': city_info['city'],
-            'country': city_info['country'],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'note': 'Estimated based on location and time'
-        }
+        return Reading(
+            pollutant='CO2',
+            value=estimated_co2,
+            units='ppm',
+            source=f'CO2 Estimate - {city_info["city"]}',
+            rating=rating,
+            indicator=indicator,
+            description=desc,
+            city=city_info['city'],
+            country=city_info['country'],
+            timestamp=ts,
+            note='Estimated based on location and time'
+        )
 
     except Exception as e:
-        logger.error(f"CO2 estimation error: {e}")
+        logger.error("CO2 estimation error: %s", e)
         return None
 
 def aqi_to_pm25(aqi):
-    """Convert AQI to PM2.5 concentration"""
-    if aqi <= 50:
-        return (aqi * 12.0 / 50)
-    elif aqi <= 100:
-        return (12.1 + (aqi - 51) * (35.4 - 12.1) / 49)
-    elif aqi <= 150:
-        return (35.5 + (aqi - 101) * (55.4 - 35.5) / 49)
-    else:
-        return (55.5 + (aqi - 151) * (150.4 - 55.5) / 49)
+    """Convert AQI to PM2.5 concentration (scalar or array)"""
+    values = np.asarray(aqi, dtype=float)
+    idx = np.searchsorted(_AQI_UPPER, values, side='left')
+    pm25 = _PM_LO[idx] + (values - _AQI_LO[idx]) * _PM_SPAN[idx] / _AQI_SPAN[idx]
+    return float(pm25) if np.isscalar(aqi) else pm25
 
 # ---------------------------
 # DATA COLLECTION
 # ---------------------------
-def collect_all_data():
-    """Collect both air quality and weather data"""
+def _city_air_quality(city, iqair_payload, cycle_ts, now=None):
+    """Measurements for one city from its IQAir payload, with PM2.5 fallback and CO2"""
+    aq_list = []
+    try:
+        # Get air quality data
+        aq_data = process_iqair_response(iqair_payload, city, cycle_ts) if iqair_payload else []
+        if aq_data:
+            aq_list.extend(aq_data)
+            logger.info("Air quality data collected for %s", city['city'])
+        else:
+            # Fallback: Create estimated PM2.5 data if no API data
+            pm25_fallback = get_fallback_pm25(city, cycle_ts, now)
+            if pm25_fallback:
+                aq_list.append(pm25_fallback)
+                logger.info("Fallback PM2.5 data created for %s", city['city'])
+
+        # Get CO2 estimation
+        co2_data = get_co2_estimation(city, cycle_ts, now)
+        if co2_data:
+            aq_list.append(co2_data)
+
+    except Exception as e:
+        logger.error("Error processing city %s: %s", city['city'], e)
+
+    return aq_list
+
+async def collect_all_data_async(now=None):
+    """Collect both air quality and weather data on the running event loop"""
+    global _SNAPSHOT
     logger.info("Starting comprehensive data collection...")
     air_quality_data = []
-    global weather_data
+    # One clock reading per cycle: record timestamps and the hour/season
+    # inputs of the estimates all come from it
+    now = now or datetime.now()
+    cycle_ts = now.strftime(TIMESTAMP_FORMAT)
+
+    cities = CONFIG["north_america_cities"]
+    new_weather = {}
+    iqair_payloads = await fetch_iqair_all(cities)
+
+    # IQAir ships current weather with its pollution data; OpenWeather
+    # (or the estimate) is only asked for cities whose payload lacks it
+    weather_results = [process_iqair_weather(payload, city, cycle_ts) if payload else None
+                       for city, payload in zip(cities, iqair_payloads)]
+    missing = [i for i, weather in enumerate(weather_results) if weather is None]
+    if missing:
+        sem = asyncio.Semaphore(HTTP_CONCURRENCY)
+
+        async def fetch_weather(city):
+            # Blocking requests on daemon threads: exit never joins one stuck in retries
+            async with sem:
+                return await run_in_daemon(get_weather_data, city, cycle_ts, now)
+
+        fetched = await asyncio.gather(*(fetch_weather(cities[i]) for i in missing))
+        for i, weather in zip(missing, fetched):
+            weather_results[i] = weather
+
+    # Aggregate in configured city order so output stays stable between runs
+    for city, payload, city_weather in zip(cities, iqair_payloads, weather_results):
+        air_quality_data.extend(_city_air_quality(city, payload, cycle_ts, now))
+        if city_weather:
+            new_weather[f"{city['city']}_{city['country']}"] = city_weather
+            logger.info("Weather data collected for %s", city['city'])
+
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT = Snapshot(weather=new_weather, readings=air_quality_data)
+
+    logger.info("Collection complete. AQ measurements: %d, Weather: %d", len(air_quality_data), len(new_weather))
+    return air_quality_data
 
-    weather_data = {}  # Reset weather data
+def collect_all_data():
+    """Collect both air quality and weather data (blocking, for callers without a loop)"""
+    return asyncio.run(collect_all_data_async())
 
-    # Get data for each city
-    for city in CONFIG["north_america_cities"]:
-        try:
-            # Get air quality data
-            aq_data = get_iqair_city_data(city)
-            if aq_data:
-                air_quality_data.extend(aq_data)
-                logger.info(f"Air quality data collected for {city['city']}")
-            else:
-                # Fallback: Create estimated PM2.5 data if no API data
-                pm25_fallback = get_fallback_pm25(city)
-                if pm25_fallback:
-                    air_quality_data.append(pm25_fallback)
-                    logger.info(f"Fallback PM2.5 data created for {city['city']}")
-
-            # Get CO2 estimation
-            co2_data = get_co2_estimation(city)
-            if co2_data:
-                air_quality_data.append(co2_data)
-
-            # Get weather data
-            city_weather = get_weather_data(city)
-            if city_weather:
-                weather_key = f"{city['city']}_{city['country']}"
-                weather_data[weather_key] = city_weather
-                logger.info(f"Weather data collected for {city['city']}")
-
-            time.sleep(1)  # Rate limiting
-
-        except Exception as e:
-            logger.error(f"Error processing city {city['city']}: {e}")
-            continue
+def get_cached_weather():
+    """Weather collected by the most recent collect_all_data() call"""
+    return get_snapshot().weather
 
-    logger.info(f"Collection complete. AQ measurements: {len(air_quality_data)}, Weather: {len(weather_data)}")
-    return air_quality_data
+class MeasurementBatch:
+    """Column-oriented (struct-of-arrays) form of a list of Readings"""
+
+    TEXT_COLUMNS = ("pollutant", "units", "source", "rating", "indicator",
+                    "description", "city", "country", "timestamp", "note")
+
+    def __init__(self, records):
+        for column in self.TEXT_COLUMNS:
+            setattr(self, column, np.array([getattr(r, column) for r in records], dtype=object))
+        self.value = np.array([r.value for r in records], dtype=np.float64)
+        # 0 marks "no AQI" (readings without an AQI, or a zero AQI)
+        self.aqi = np.array([r.aqi or 0 for r in records], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.value)
+
+    def city_mask(self, city, country):
+        """Boolean mask selecting one city's measurements"""
+        return (self.city == city) & (self.country == country)
 
 # ---------------------------
 # DISPLAY FUNCTIONS
 # ---------------------------
-def display_results(air_quality_data, run_number):
+# Country heading prefixes for the report
+_FLAGS = {"USA": "🇺🇸", "Canada": "🇨🇦", "Mexico": "🇲🇽"}
+_DEFAULT_FLAG = "🌎"
+
+def _group_cities(cities):
+    """(country, ((city, weather key), ...)) pairs in display order"""
+    grouped = defaultdict(list)
+    for city in cities:
+        grouped[city['country']].append((city['city'], f"{city['city']}_{city['country']}"))
+    return tuple((country, tuple(grouped[country])) for country in sorted(grouped))
+
+# The city list is fixed at import, so the report's country grouping is too
+_CITY_GROUPS = _group_cities(CONFIG['north_america_cities'])
+
+# Decorated per-city report only for interactive terminals
+_TTY = sys.stdout.isatty()
+
+def _write_lines(lines):
+    """Write buffered report lines to stdout in a single call"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+def summary_stats(air_quality_data, weather_data):
+    """Regional summary counters for one cycle (averages/extremes None when empty)"""
+    # Single pass over the readings for every reading statistic
+    pm25_limit = HEALTH_THRESHOLDS['PM2_5']['MODERATE']
+    unhealthy_ratings = _UNHEALTHY_RATINGS
+    aqi_sum = aqi_n = 0
+    aqi_max = float('-inf')
+    aqi_min = float('inf')
+    pm25_sum = pm25_n = 0
+    pm25_max = float('-inf')
+    unhealthy_pm25 = unhealthy_aq = 0
+    for item in air_quality_data:
+        aqi = item.aqi
+        if aqi is not None:
+            aqi_sum += aqi
+            aqi_n += 1
+            if aqi > aqi_max:
+                aqi_max = aqi
+            if aqi < aqi_min:
+                aqi_min = aqi
+        if item.pollutant == 'PM2_5':
+            value = item.value
+            pm25_sum += value
+            pm25_n += 1
+            if value > pm25_max:
+                pm25_max = value
+            if value > pm25_limit:
+                unhealthy_pm25 += 1
+        if item.rating in unhealthy_ratings:
+            unhealthy_aq += 1
+
+    impact_scores = np.fromiter((w.get('aqi_impact', 50) for w in weather_data.values()),
+                                dtype=np.float32, count=len(weather_data))
+
+    return {
+        'countries': len(_CITY_GROUPS),
+        'weather_cities': len(weather_data),
+        'measurements': len(air_quality_data),
+        'aqi_count': aqi_n,
+        'aqi_avg': aqi_sum / aqi_n if aqi_n else None,
+        'aqi_max': aqi_max if aqi_n else None,
+        'aqi_min': aqi_min if aqi_n else None,
+        'pm25_count': pm25_n,
+        'pm25_avg': pm25_sum / pm25_n if pm25_n else None,
+        'pm25_max': pm25_max if pm25_n else None,
+        'unhealthy_pm25': unhealthy_pm25,
+        'impact_avg': float(impact_scores.mean()) if impact_scores.size else None,
+        'poor_dispersion': int((impact_scores > 60).sum()),
+        'unhealthy_aq': unhealthy_aq
+    }
+
+def display_results(air_quality_data, run_number, report_ts=None, tty=None):
     """Display the monitoring results with enhanced AQI and PM2.5 visibility"""
-    global current_data
-    current_data = air_quality_data
+    # Off a terminal (tty=None follows stdout) only a one-line JSON summary is logged
+    weather_data = get_snapshot().weather
+    if not (_TTY if tty is None else tty):
+        logger.info("Update #%d summary: %s", run_number,
+                    json.dumps(summary_stats(air_quality_data, weather_data)))
+        return
 
-    print("\n" + "=" * 80)
-    print(f"🛡️ SKYSHIELD - NORTH AMERICA AIR QUALITY & WEATHER")
-    print(f"Update #{run_number} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 80)
+    # Whole report is buffered and written in one call
+    lines = []
+    out = lines.append
+
+    out("\n" + "=" * 80)
+    out(f"🛡️ SKYSHIELD - NORTH AMERICA AIR QUALITY & WEATHER")
+    out(f"Update #{run_number} - {report_ts or cycle_timestamp()}")
+    out("=" * 80)
 
     if not air_quality_data and not weather_data:
-        print("❌ No data available. Please check:")
-        print("   • Internet connection")
-        print("   • API key validity")
+        out("❌ No data available. Please check:")
+        out("   • Internet connection")
+        out("   • API key validity")
+        _write_lines(lines)
         return
 
-    # Display data by country
-    countries = sorted(set([city['country'] for city in CONFIG['north_america_cities']]))
-
-    for country in countries:
-        print(f"\n🇺🇸 {country.upper()}:" if country == 'USA' else f"\n🇨🇦 {country.upper()}:" if country == 'Canada' else f"\n🇲🇽 {country.upper()}:")
-        print("-" * 40)
+    # Index measurements once instead of re-filtering per city
+    by_city = defaultdict(list)
+    for d in air_quality_data:
+        by_city[(d.city, d.country)].append(d)
 
-        country_cities = [city for city in CONFIG['north_america_cities'] if city['country'] == country]
+    # Display data by country
+    for country, cities in _CITY_GROUPS:
+        out(f"\n{_FLAGS.get(country, _DEFAULT_FLAG)} {country.upper()}:")
+        out("-" * 40)
 
-        for city_info in country_cities:
-            city_key = f"{city_info['city']}_{city_info['country']}"
+        for city_name, city_key in cities:
 
             # Display weather data
             if city_key in weather_data:
                 weather = weather_data[city_key]
-                print(f"\n📍 {city_info['city']}:")
-                print(f"   🌡️  Temp: {weather['temperature']:.1f}°C")
-                print(f"   💧 Humidity: {weather['humidity']}%")
-                print(f"   💨 Wind: {weather['wind_speed']} m/s")
-                print(f"   ☁️  Conditions: {weather['weather_description']}")
-                print(f"   📊 AQI Impact: {display_weather_impact(weather['aqi_impact'])}")
+                out(f"\n📍 {city_name}:")
+                out(f"   🌡️  Temp: {weather['temperature']:.1f}°C")
+                out(f"   💧 Humidity: {weather['humidity']}%")
+                out(f"   💨 Wind: {weather['wind_speed']} m/s")
+                out(f"   ☁️  Conditions: {weather['weather_description']}")
+                out(f"   📊 AQI Impact: {display_weather_impact(weather['aqi_impact'])}")
 
             # Display air quality data for this city - PRIORITIZE AQI and PM2.5
-            city_aq_data = [d for d in air_quality_data if d['city'] == city_info['city'] and d['country'] == country]
+            city_aq_data = by_city.get((city_name, country), [])
 
             if city_aq_data:
-                print(f"   🏭 Air Quality:")
+                out(f"   🏭 Air Quality:")
+
+                # Split the city's measurements in one sweep
+                pm25_data, aqi_data, other_pollutants = [], [], []
+                for d in city_aq_data:
+                    if d.pollutant == 'PM2_5':
+                        pm25_data.append(d)
+                    if d.aqi is not None:
+                        aqi_data.append(d)
+                    elif d.pollutant != 'PM2_5':
+                        other_pollutants.append(d)
 
                 # Show PM2.5 FIRST and most prominently
-                pm25_data = [d for d in city_aq_data if d['pollutant'] == 'PM2_5']
                 if pm25_data:
                     pm25 = pm25_data[0]
-                    source_indicator = "📡" if "IQAir" in pm25['source'] else "📊"
-                    print(f"      {source_indicator} PM2.5: {pm25['value']:.1f} μg/m³ {pm25['indicator']}")
-                    print(f"         {pm25['description']}")
-                    if 'note' in pm25:
-                        print(f"         ⚠️  {pm25['note']}")
+                    source_indicator = "📡" if "IQAir" in pm25.source else "📊"
+                    out(f"      {source_indicator} PM2.5: {pm25.value:.1f} μg/m³ {pm25.indicator}")
+                    out(f"         {pm25.description}")
+                    if pm25.note is not None:
+                        out(f"         ⚠️  {pm25.note}")
 
                 # Show AQI if available
-                aqi_data = [d for d in city_aq_data if 'aqi' in d]
                 if aqi_data:
-                    aqi = aqi_data[0]['aqi']
+                    aqi = aqi_data[0].aqi
                     # Color code AQI
                     if aqi <= 50:
                         aqi_color = "🟢"  # Good
@@ -835,156 +1213,178 @@ def display_results(air_quality_data, run_number):
                     else:
                         aqi_color = "💀"  # Hazardous
 
-                    print(f"      {aqi_color} US AQI: {aqi} {get_aqi_description(aqi)}")
+                    out(f"      {aqi_color} US AQI: {aqi} {get_aqi_description(aqi)}")
 
                 # Show other pollutants
-                other_pollutants = [d for d in city_aq_data if d['pollutant'] not in ['PM2_5'] and 'aqi' not in d]
                 for pollutant in other_pollutants:
-                    if pollutant['pollutant'] == 'CO2':
-                        print(f"      🌫️  CO₂: {pollutant['value']:.0f} ppm {pollutant['indicator']}")
-                    elif pollutant['pollutant'] == 'O3':
-                        print(f"      ⚡ O₃: {pollutant['value']:.1f} ppb {pollutant['indicator']}")
-                    elif pollutant['pollutant'] == 'NO2':
-                        print(f"      🚗 NO₂: {pollutant['value']:.1f} ppb {pollutant['indicator']}")
+                    if pollutant.pollutant == 'CO2':
+                        out(f"      🌫️  CO₂: {pollutant.value:.0f} ppm {pollutant.indicator}")
+                    elif pollutant.pollutant == 'O3':
+                        out(f"      ⚡ O₃: {pollutant.value:.1f} ppb {pollutant.indicator}")
+                    elif pollutant.pollutant == 'NO2':
+                        out(f"      🚗 NO₂: {pollutant.value:.1f} ppb {pollutant.indicator}")
             else:
-                print(f"   🏭 Air Quality: No data available")
+                out(f"   🏭 Air Quality: No data available")
 
     # Enhanced Summary Section
-    print(f"\n📊 REGIONAL AIR QUALITY SUMMARY:")
-    print(f"   Countries monitored: {len(countries)}")
-    print(f"   Cities with weather data: {len(weather_data)}")
-    print(f"   Total AQ measurements: {len(air_quality_data)}")
+    out(f"\n📊 REGIONAL AIR QUALITY SUMMARY:")
+    out(f"   Countries monitored: {len(_CITY_GROUPS)}")
+    out(f"   Cities with weather data: {len(weather_data)}")
+    out(f"   Total AQ measurements: {len(air_quality_data)}")
+
+    stats = summary_stats(air_quality_data, weather_data)
 
     # AQI Analysis
-    aqi_values = [d['aqi'] for d in air_quality_data if 'aqi' in d]
-    if aqi_values:
-        avg_aqi = sum(aqi_values) / len(aqi_values)
-        max_aqi = max(aqi_values)
-        min_aqi = min(aqi_values)
+    if stats['aqi_count']:
+        avg_aqi = stats['aqi_avg']
+        max_aqi = stats['aqi_max']
+        min_aqi = stats['aqi_min']
 
-        print(f"\n   📈 AQI Statistics:")
-        print(f"      Average AQI: {avg_aqi:.1f} {get_aqi_description(avg_aqi)}")
-        print(f"      Highest AQI: {max_aqi} {get_aqi_description(max_aqi)}")
-        print(f"      Lowest AQI: {min_aqi} {get_aqi_description(min_aqi)}")
+        out(f"\n   📈 AQI Statistics:")
+        out(f"      Average AQI: {avg_aqi:.1f} {get_aqi_description(avg_aqi)}")
+        out(f"      Highest AQI: {max_aqi} {get_aqi_description(max_aqi)}")
+        out(f"      Lowest AQI: {min_aqi} {get_aqi_description(min_aqi)}")
 
     # PM2.5 Analysis
-    pm25_values = [d['value'] for d in air_quality_data if d['pollutant'] == 'PM2_5']
-    if pm25_values:
-        avg_pm25 = sum(pm25_values) / len(pm25_values)
-        max_pm25 = max(pm25_values)
-
-        print(f"\n   💨 PM2.5 Statistics:")
-        print(f"      Average PM2.5: {avg_pm25:.1f} μg/m³")
-        print(f"      Highest PM2.5: {max_pm25:.1f} μg/m³")
+    if stats['pm25_count']:
+        out(f"\n   💨 PM2.5 Statistics:")
+        out(f"      Average PM2.5: {stats['pm25_avg']:.1f} μg/m³")
+        out(f"      Highest PM2.5: {stats['pm25_max']:.1f} μg/m³")
 
         # Health impact summary
-        unhealthy_pm25 = len([v for v in pm25_values if v > HEALTH_THRESHOLDS['PM2_5']['MODERATE']])
+        unhealthy_pm25 = stats['unhealthy_pm25']
         if unhealthy_pm25 > 0:
-            print(f"      ⚠️  Unhealthy PM2.5 in {unhealthy_pm25} cities")
+            out(f"      ⚠️  Unhealthy PM2.5 in {unhealthy_pm25} cities")
 
     # Weather impact analysis - UPDATED for numeric scores
-    impact_scores = [w.get('aqi_impact', 50) for w in weather_data.values()]
-    if impact_scores:
-        avg_impact = sum(impact_scores) / len(impact_scores)
-        poor_conditions = len([s for s in impact_scores if s > 60])
+    avg_impact = stats['impact_avg']
+    if avg_impact is not None:
+        poor_conditions = stats['poor_dispersion']
 
-        print(f"\n   🌤️  Weather Impact Analysis:")
-        print(f"      Average Dispersion Score: {avg_impact:.1f}/100")
+        out(f"\n   🌤️  Weather Impact Analysis:")
+        out(f"      Average Dispersion Score: {avg_impact:.1f}/100")
         if avg_impact <= 40:
-            print(f"      ✅ Generally favorable dispersion conditions")
+            out(f"      ✅ Generally favorable dispersion conditions")
         elif avg_impact <= 70:
-            print(f"      ⚠️  Mixed dispersion conditions")
+            out(f"      ⚠️  Mixed dispersion conditions")
         else:
-            print(f"      🚨 Poor dispersion conditions across region")
+            out(f"      🚨 Poor dispersion conditions across region")
 
         if poor_conditions > 0:
-            print(f"      ⚠️  Poor dispersion in {poor_conditions} cities")
+            out(f"      ⚠️  Poor dispersion in {poor_conditions} cities")
 
     # Air quality analysis
-    unhealthy_aq = [item for item in air_quality_data if item['rating'] in ['UNHEALTHY', 'VERY UNHEALTHY', 'POOR']]
-    if unhealthy_aq:
-        print(f"   🚨 Unhealthy air quality: {len(unhealthy_aq)} measurements")
+    if stats['unhealthy_aq']:
+        out(f"   🚨 Unhealthy air quality: {stats['unhealthy_aq']} measurements")
     else:
-        print(f"   ✅ Air quality: Generally acceptable")
+        out(f"   ✅ Air quality: Generally acceptable")
 
-    print("=" * 80)
+    out("=" * 80)
+    _write_lines(lines)
 
 
 # ---------------------------
 # MONITORING SYSTEM
 # ---------------------------
-def perform_update():
-    """Perform a single update cycle"""
+# prefix -> (day, append handle); kept open across cycles, rotated daily
+_OUTPUT_FILES = {}
+
+def _output_file(prefix, day):
+    """Append handle for a series' file of the given day, reopened when the day changes"""
+    current = _OUTPUT_FILES.get(prefix)
+    if current is not None:
+        if current[0] == day:
+            return current[1]
+        current[1].close()
+    f = open(f"{prefix}_{day}.jsonl", 'ab', buffering=1 << 20)
+    _OUTPUT_FILES[prefix] = (day, f)
+    return f
+
+def close_output_files():
+    """Flush and close the rolling output files"""
+    while _OUTPUT_FILES:
+        _, (_, f) = _OUTPUT_FILES.popitem()
+        f.close()
+
+def save_results(data, weather_data, day=None):
+    """Append one cycle's air quality and weather data to today's JSONL files"""
+    day = day or datetime.now().strftime("%Y%m%d")
+
+    # Save air quality data
+    f = _output_file("sky_shield_aq", day)
+    f.writelines(json_line(asdict(r)) for r in data)
+    f.flush()
+    aq_filename = f.name
+
+    # Save weather data
+    if weather_data:
+        f = _output_file("sky_shield_weather", day)
+        f.writelines(json_line(w) for w in weather_data.values())
+        f.flush()
+        print(f"💾 Data saved to: {aq_filename} and {f.name}")
+    else:
+        print(f"💾 Air quality data saved to: {aq_filename}")
+
+async def perform_update_async():
+    """Perform a single update cycle on the running event loop"""
     global run_count
     run_count += 1
 
-    logger.info(f"Performing update #{run_count}")
+    logger.info("Performing update #%d", run_count)
+    # Read the clock once; records, report header and file name share it
+    now = datetime.now()
+    cycle_ts = now.strftime(TIMESTAMP_FORMAT)
     try:
-        data = collect_all_data()
-        display_results(data, run_count)
+        data = await collect_all_data_async(now)
+        display_results(data, run_count, cycle_ts)
 
-        # Save data
+        # Save data (file I/O kept off the event loop)
         if data:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-            # Save air quality data
-            aq_filename = f"sky_shield_aq_{timestamp}.csv"
-            df_aq = pd.DataFrame(data)
-            df_aq.to_csv(aq_filename, index=False)
-
-            # Save weather data
-            if weather_data:
-                weather_filename = f"sky_shield_weather_{timestamp}.csv"
-                df_weather = pd.DataFrame(weather_data.values())
-                df_weather.to_csv(weather_filename, index=False)
-                print(f"💾 Data saved to: {aq_filename} and {weather_filename}")
-            else:
-                print(f"💾 Air quality data saved to: {aq_filename}")
+            await asyncio.to_thread(save_results, data, get_snapshot().weather, now.strftime("%Y%m%d"))
 
     except Exception as e:
-        logger.error(f"Update error: {e}")
+        logger.error("Update error: %s", e)
         print(f"❌ Update failed: {e}")
 
+async def run_monitoring():
+    """Update every interval on one event loop until interrupted"""
+    interval = CONFIG['update_interval_minutes'] * 60
+    while True:
+        await perform_update_async()
+        await asyncio.sleep(interval)
+
+
+# City list and interval are fixed at import, so the banner is too
+_MONITOR_BANNER = "\n".join([
+    "\n" + "=" * 80,
+    "🛡️ STARTING SKYSHIELD COMPREHENSIVE MONITORING",
+    "=" * 80,
+    "NASA Space Apps Challenge 2025 - Team BlueForce",
+    "Creator: Ahmed Wael",
+    "\nMonitoring Configuration:",
+    "   • Region: North America",
+    "   • Countries: USA, Canada, Mexico",
+    f"   • Cities: {len(CONFIG['north_america_cities'])}",
+    "   • Data: Air Quality + Weather",
+    f"   • Update Interval: {CONFIG['update_interval_minutes']} minutes",
+    "\nPress Ctrl+C to stop monitoring",
+    "=" * 80,
+    ""
+])
 
 def start_monitoring():
     """Start the continuous monitoring"""
-    global monitoring_active
-
-    print("\n" + "=" * 80)
-    print("🛡️ STARTING SKYSHIELD COMPREHENSIVE MONITORING")
-    print("=" * 80)
-    print("NASA Space Apps Challenge 2025 - Team BlueForce")
-    print("Creator: Ahmed Wael")
-    print("\nMonitoring Configuration:")
-    print(f"   • Region: North America")
-    print(f"   • Countries: USA, Canada, Mexico")
-    print(f"   • Cities: {len(CONFIG['north_america_cities'])}")
-    print(f"   • Data: Air Quality + Weather")
-    print(f"   • Update Interval: {CONFIG['update_interval_minutes']} minutes")
-    print("\nPress Ctrl+C to stop monitoring")
-    print("=" * 80)
-
-    # Initial update
-    perform_update()
-
-    # Start auto-updates
-    def auto_update():
-        while monitoring_active:
-            time.sleep(CONFIG['update_interval_minutes'] * 60)
-            if monitoring_active:
-                perform_update()
-
-    update_thread = threading.Thread(target=auto_update, daemon=True)
-    update_thread.start()
-
-    # Keep main thread alive
+    sys.stdout.write(_MONITOR_BANNER)
+
+    # Initial update, then one every interval; collection, display and any
+    # future endpoints share this loop instead of a dedicated sleeper thread
     try:
-        while monitoring_active:
-            time.sleep(1)
+        asyncio.run(run_monitoring())
     except KeyboardInterrupt:
-        monitoring_active = False
         print("\n\n🛑 Monitoring stopped by user")
         print("Thank you for using SkyShield!")
+    finally:
+        close_output_files()
 
 
 # ---------------------------
@@ -992,59 +1392,100 @@ def start_monitoring():
 # ---------------------------
 def test_aqi_pm25_display():
     """Test function to verify AQI and PM2.5 display"""
+    ts = cycle_timestamp()
     test_data = [
-        {
-            'pollutant': 'PM2_5',
-            'value': 25.4,
-            'units': 'μg/m³',
-            'source': 'IQAir - New York, USA',
-            'rating': 'MODERATE',
-            'indicator': '[M]',
-            'description': 'Moderate - acceptable air quality',
-            'aqi': 78,
-            'city': 'New York',
-            'country': 'USA',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        },
-        {
-            'pollutant': 'US_AQI',
-            'value': 78,
-            'units': 'AQI',
-            'source': 'IQAir - New York, USA',
-            'rating': 'MODERATE',
-            'indicator': '[M]',
-            'description': '(Moderate)',
-            'city': 'New York',
-            'country': 'USA',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        Reading(
+            pollutant='PM2_5',
+            value=25.4,
+            units='μg/m³',
+            source='IQAir - New York, USA',
+            rating='MODERATE',
+            indicator='[M]',
+            description='Moderate - acceptable air quality',
+            aqi=78,
+            city='New York',
+            country='USA',
+            timestamp=ts
+        ),
+        Reading(
+            pollutant='US_AQI',
+            value=78,
+            units='AQI',
+            source='IQAir - New York, USA',
+            rating='MODERATE',
+            indicator='[M]',
+            description='(Moderate)',
+            city='New York',
+            country='USA',
+            timestamp=ts
+        )
     ]
 
     print("🧪 TESTING AQI & PM2.5 DISPLAY:")
-    display_results(test_data, 999)
+    display_results(test_data, 999, ts, tty=True)
+
+# Band edges with the results of the original if/elif conversions
+_PM25_TO_AQI_EXPECTED = {
+    0.0: 0, 5.0: 20, 12.0: 50, 12.1: 51, 20.0: 67, 35.4: 100, 35.5: 101,
+    55.4: 150, 55.5: 151, 100.0: 173, 150.4: 200, 150.5: 201, 250.4: 300,
+    250.5: 301, 500.4: 500, -1.0: -4, float('nan'): 0, float('inf'): 0
+}
+_AQI_TO_PM25_EXPECTED = {
+    0: 0.0, 30: 7.2, 50: 12.0, 51: 12.1, 78: 24.93877551020408, 100: 35.4,
+    101: 35.5, 150: 55.4, 151: 55.5, 200: 150.4
+}
+
+def test_aqi_conversions():
+    """Check both conversions (scalar and array) against the original results"""
+    pm25 = list(_PM25_TO_AQI_EXPECTED)
+    expected = list(_PM25_TO_AQI_EXPECTED.values())
+    got = [pm25_to_aqi(v) for v in pm25]
+    assert got == expected, f"pm25_to_aqi: {got} != {expected}"
+    assert pm25_to_aqi(np.array(pm25)).tolist() == expected, "pm25_to_aqi (array)"
+
+    aqi = list(_AQI_TO_PM25_EXPECTED)
+    expected = list(_AQI_TO_PM25_EXPECTED.values())
+    got = [aqi_to_pm25(v) for v in aqi]
+    assert got == expected, f"aqi_to_pm25: {got} != {expected}"
+    assert aqi_to_pm25(np.array(aqi)).tolist() == expected, "aqi_to_pm25 (array)"
+    print("✅ AQI/PM2.5 conversions match the original breakpoint code")
 
 
 # ---------------------------
 # MAIN EXECUTION
 # ---------------------------
-def main():
+_MAIN_HEADER = "\n".join([
+    "\n" + "=" * 80,
+    "🛡️ SKYSHIELD - NASA SPACE APPS CHALLENGE 2025",
+    "North America Air Quality & Weather Monitoring System",
+    "=" * 80,
+    ""
+])
+
+def main(argv=None):
     """Main execution function"""
-    print("\n" + "=" * 80)
-    print("🛡️ SKYSHIELD - NASA SPACE APPS CHALLENGE 2025")
-    print("North America Air Quality & Weather Monitoring System")
-    print("=" * 80)
-
-    # Test connectivity
-    print("🔍 Testing system connectivity...")
-    try:
-        # Test basic internet
-        response = requests.get("http://api.airvisual.com/v2/nearest_city?key=demo", timeout=10)
-        if response.status_code == 200:
-            print("✅ Internet connection: OK")
-        else:
-            print("❌ AirVisual API: Limited access")
-    except:
-        print("❌ Internet connection: Issues detected")
+    parser = argparse.ArgumentParser(description="SkyShield North America air quality monitor")
+    parser.add_argument("--force-refresh", action="store_true",
+                        help="ignore cached API responses and query upstream every cycle")
+    parser.add_argument("--skip-probe", action="store_true",
+                        help="start without the connectivity check")
+    args = parser.parse_args(argv)
+    CONFIG["force_refresh"] = args.force_refresh
+
+    sys.stdout.write(_MAIN_HEADER)
+
+    # Test connectivity (also warms SESSION's pool for the first cycle)
+    if not args.skip_probe:
+        print("🔍 Testing system connectivity...")
+        try:
+            response = SESSION.get("http://api.airvisual.com/v2/nearest_city?key=demo", timeout=HTTP_TIMEOUT)
+            if response.status_code == 200:
+                print("✅ Internet connection: OK")
+            else:
+                print("❌ AirVisual API: Limited access")
+        except requests.RequestException as e:
+            logger.warning("Connectivity probe failed: %s", e)
+            print("❌ Internet connection: Issues detected")
 
     # Start monitoring
     start_monitoring()
@@ -1057,4 +1498,4 @@ if __name__ == "__main__":
         print("\n👋 SkyShield terminated by user")
     except Exception as e:
         print(f"\n💥 Fatal error: {e}")
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)